@@ -21,3 +21,15 @@ def reload():
 def quit():
     """Quits the program"""
     exit()
+
+
+def cache():
+    """Shows derivative cache statistics."""
+    from solver import derivative_cache
+    return str(derivative_cache)
+
+
+def close():
+    """Closes every plot window."""
+    from draw import close_plots
+    close_plots()
@@ -3,75 +3,543 @@ Function visualization module for AnCalc
 Uses matplotlib for plotting mathematical functions
 """
 
-import matplotlib.pyplot as plt
+import atexit
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import threading
+import time
+
 import numpy as np
-from symbolic_math import symbols
-from solver import evaluate_expr
+import globals
+from symbolic_math import symbols, Eq, Div, Pow, postorder
+from solver import evaluate_array, evaluate_derivatives, classify, solve, derivative, critical_points
+from poly import to_poly, to_rational, cancel_common, is_expanded
+
+
+# Environment variable that turns on headless rendering (any value but "" or "0")
+HEADLESS_ENV = 'ANCALC_HEADLESS'
+
+# Size of every plot, in inches
+FIGURE_SIZE = (10, 6)
+
+# Resolution of exported plots
+EXPORT_DPI = 300
+
+# Line colors of the functions on a graph with several of them
+COLORS = ['b', 'r', 'g', 'orange', 'purple', 'brown', 'pink', 'gray', 'olive', 'cyan']
+
+# Seconds the render worker runs the window event loop between checks for new plots
+RENDER_POLL_INTERVAL = 0.05
+
+
+def headless():
+    """Wether plots are rendered to files only (see globals.HEADLESS_PLOTS)"""
+    return globals.HEADLESS_PLOTS or os.environ.get(HEADLESS_ENV, '') not in ('', '0')
+
+
+def _pyplot():
+    """
+    matplotlib.pyplot, imported on the first plot window rather than with the module
+    
+    Matplotlib takes longer to import than the rest of AnCalc together, so
+    sessions that never plot do not pay for it. Files are rendered without
+    pyplot (see _save), so headless sessions never load a window backend.
+    """
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _draw(fig, plot):
+    """
+    Draw a plot on an empty figure
+    
+    Args:
+        fig: matplotlib Figure
+        plot: dict with the sampled 'curves' as (x_values, y_values) pairs,
+            their 'labels' (None for a single unlabelled curve), 'title',
+            'var_name' and 'y_limits' (or None)
+    """
+    ax = fig.add_subplot()
+    labels = plot['labels']
+    for i, (x_values, y_values) in enumerate(plot['curves']):
+        if labels is None:
+            ax.plot(x_values, y_values, 'b-', linewidth=2)
+        else:
+            ax.plot(x_values, y_values, color=COLORS[i % len(COLORS)], linewidth=2, label=labels[i])
+    if plot['y_limits']:
+        ax.set_ylim(*plot['y_limits'])
+    
+    ax.grid(True, alpha=0.3)
+    ax.axhline(y=0, color='k', linewidth=0.5)
+    ax.axvline(x=0, color='k', linewidth=0.5)
+    ax.set_xlabel(plot['var_name'], fontsize=12)
+    ax.set_ylabel(f"f({plot['var_name']})", fontsize=12)
+    if labels is not None:
+        ax.legend()
+    ax.set_title(plot['title'], fontsize=14)
+
+
+def _save(plot, export_path, fig=None, dpi=EXPORT_DPI):
+    """
+    Render a plot (see _draw) straight to a file, without pyplot or a window
+    
+    Args:
+        plot: Plot description (see _draw)
+        export_path: File to write, its extension picks the format (png, svg...)
+        fig: Figure to reuse, cleared first (optional, a new one otherwise)
+        dpi: Resolution of the file
+    """
+    if fig is None:
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=FIGURE_SIZE)
+    else:
+        fig.clear()
+    _draw(fig, plot)
+    fig.savefig(export_path, dpi=dpi, bbox_inches='tight')
+
+
+def _show(plot, export_path):
+    """
+    Save a plot if asked, then display it
+    
+    With globals.BACKGROUND_PLOTS the window is opened by the render worker
+    and this returns at once (windows still open when the program ends are
+    waited for); otherwise it blocks until the window is closed. Headless mode only saves the plot (to HEADLESS_PLOT_PATH when no
+    export path is given).
+    """
+    if headless() and not export_path:
+        export_path = globals.HEADLESS_PLOT_PATH
+    
+    # Export if path is provided
+    if export_path:
+        _save(plot, export_path)
+        print(f"Plot saved to {export_path}")
+    
+    if headless():
+        return
+    if globals.BACKGROUND_PLOTS:
+        _submit(plot)
+    else:
+        plt = _pyplot()
+        _draw(plt.figure(figsize=FIGURE_SIZE), plot)
+        plt.show()
+
+
+# Render worker process (started by the first plot window)
+_render_process = None
+
+
+def _start_worker(entry, **pipes):
+    """
+    Start a worker process running draw.<entry>() with a pipe to its stdin
+    
+    The worker is a fresh interpreter that only imports this module, so the
+    caller's script is never re-run and no GUI state is inherited.
+    """
+    path = [os.path.dirname(os.path.abspath(__file__))] + os.environ.get('PYTHONPATH', '').split(os.pathsep)
+    return subprocess.Popen(
+        [sys.executable, '-c', f'import draw; draw.{entry}()'],
+        stdin=subprocess.PIPE,
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(path)),
+        **pipes
+    )
+
+
+def _submit(plot):
+    """Hand a plot over to the render worker, starting the worker if needed"""
+    global _render_process
+    if _render_process is None or _render_process.poll() is not None:
+        _render_process = _start_worker('_render_main')
+    pickle.dump(plot, _render_process.stdin)
+    _render_process.stdin.flush()
+
+
+def close_plots():
+    """Close every plot window and stop the render worker"""
+    global _render_process
+    if _render_process is not None and _render_process.poll() is None:
+        # A None plot closes the windows, end of input alone leaves them open
+        pickle.dump(None, _render_process.stdin)
+        _render_process.stdin.close()
+        _render_process.wait()
+    _render_process = None
+
+
+def _wait_for_plots():
+    """
+    At exit, keep the plot windows open until the user closes them
+    
+    A script that plots and ends then behaves as with blocking windows,
+    instead of its windows vanishing with it.
+    """
+    global _render_process
+    if _render_process is not None and _render_process.poll() is None:
+        _render_process.stdin.close()
+        _render_process.wait()
+    _render_process = None
+
+
+atexit.register(_wait_for_plots)
+
+
+# Job the render worker gets when its input ends: no more plots will come
+_END_OF_INPUT = 'end of input'
+
+
+def _render_main():
+    """Render worker entry point: plots arrive pickled on stdin"""
+    jobs = queue.Queue()
+    
+    def read():
+        while True:
+            try:
+                jobs.put(pickle.load(sys.stdin.buffer))
+            except EOFError:
+                break
+        jobs.put(_END_OF_INPUT)
+    
+    threading.Thread(target=read, daemon=True).start()
+    _render_loop(jobs)
+
+
+def _render_loop(jobs):
+    """
+    Open a window for every plot received on jobs (a queue.Queue)
+    
+    The windows' event loop runs between checks for new plots, so all open
+    windows stay responsive (zoom, pan, resize) while the REPL carries on.
+    A None job closes the windows and ends the loop; after _END_OF_INPUT
+    the loop ends once the user has closed every window.
+    """
+    plt = _pyplot()
+    finishing = False
+    while True:
+        if plt.get_fignums():
+            canvas = plt.gcf().canvas
+            if finishing and canvas.required_interactive_framework is None:
+                # Without a GUI backend nobody can close the windows
+                break
+            canvas.start_event_loop(RENDER_POLL_INTERVAL)
+            if finishing:
+                continue
+            try:
+                plot = jobs.get_nowait()
+            except queue.Empty:
+                continue
+        elif finishing:
+            break
+        else:
+            plot = jobs.get()
+        if plot is None:
+            break
+        if plot is _END_OF_INPUT:
+            finishing = True
+            continue
+        _draw(plt.figure(figsize=FIGURE_SIZE), plot)
+        plt.show(block=False)
+    plt.close('all')
+
+
+# Uniform samples taken before adaptive refinement
+ADAPTIVE_INITIAL_POINTS = 65
+
+# Intervals are split while linear interpolation misses the midpoint by more
+# than this fraction of the plot height
+ADAPTIVE_TOLERANCE = 1e-3
+
+# Intervals are not split below this fraction of the x range
+ADAPTIVE_MIN_WIDTH = 1e-9
+
+
+def _evaluator(expression, var):
+    """
+    Vectorized function evaluating expression, with Horner's scheme for
+    expanded polynomials and ratios of them (after cancelling common factors,
+    so removable singularities like x = 0 in x**2 / x are filled in)
+    
+    Other forms are evaluated as written: expanding (x - 1.1)**20 would
+    leave only rounding noise near x = 1.1.
+    """
+    if is_expanded(expression, var):
+        poly = to_poly(expression, var)
+    else:
+        poly = None
+    if poly is None:
+        ratio = isinstance(expression, Div) and is_expanded(expression.left, var) \
+            and is_expanded(expression.right, var)
+        rational = to_rational(expression, var) if ratio else None
+        if rational is None:
+            return lambda x_values: evaluate_array(expression, var, x_values)
+        num, den = cancel_common(*rational) or rational
+        poly = lambda x_values: num(x_values) / den(x_values)
+    
+    def evaluate(x_values):
+        with np.errstate(all='ignore'):
+            return np.broadcast_to(poly(x_values), x_values.shape).astype(float)
+    return evaluate
+
+
+def adaptive_sample(func, x_min, x_max, budget=500):
+    """
+    Sample a function densely where it bends and sparsely where it is flat
+    
+    Starts from a coarse uniform grid, then repeatedly evaluates the
+    midpoints of the intervals where the curve is not yet resolved and keeps
+    splitting those where linear interpolation misses the midpoint (or where
+    the function becomes undefined), until the evaluation budget is spent.
+    Intervals still unresolved at the end straddle a pole when they jump by
+    more than the plot height against the trend on both sides, and a jump
+    when they could not be split any further: a NaN is inserted there so
+    the line is broken instead of drawn across.
+    
+    Several curves can share one evaluation: when func returns one row per
+    curve, an interval is split while any of them is unresolved there.
+    
+    Args:
+        func: Vectorized function, array of x -> array of y, or 2D array
+            with one row of y per curve
+        x_min: Minimum x value
+        x_max: Maximum x value
+        budget: Maximum number of evaluations
+    
+    Returns:
+        tuple: (x_values, y_values) arrays, sorted by x, or a list of them
+            (one per row) when func returns rows
+    """
+    x_values = np.linspace(x_min, x_max, max(2, min(ADAPTIVE_INITIAL_POINTS, budget)))
+    y_values = np.asarray(func(x_values), dtype=float)
+    rows = y_values.ndim > 1
+    y_values = np.atleast_2d(y_values)
+    used = len(x_values)
+    
+    # Plot height of each curve, from the uniform samples and ignoring the spikes of poles
+    heights = []
+    for row in y_values:
+        finite = row[np.isfinite(row)]
+        if len(finite):
+            low, high = np.percentile(finite, [5, 95])
+        else:
+            low = high = 0
+        heights.append(high - low if high > low else max(1.0, abs(high)))
+    height = np.array(heights)[:, None]
+    min_width = (x_max - x_min) * ADAPTIVE_MIN_WIDTH
+    
+    # Intervals (between consecutive samples) not yet known to be resolved, per curve
+    active = np.ones((len(y_values), len(x_values) - 1), dtype=bool)
+    while used < budget:
+        left = np.flatnonzero(active.any(axis=0) & (np.diff(x_values) > min_width))
+        if not len(left):
+            break
+        # Largest jumps first when the budget does not cover every interval
+        if len(left) > budget - used:
+            jumps = np.abs(np.diff(y_values, axis=1))[:, left]
+            jumps[~np.isfinite(jumps)] = np.inf
+            jumps = jumps.max(axis=0)
+            left = np.sort(left[np.argsort(-jumps, kind='stable')[:budget - used]])
+        
+        mid_x = (x_values[left] + x_values[left + 1]) / 2
+        mid_y = np.atleast_2d(np.asarray(func(mid_x), dtype=float))
+        used += len(left)
+        
+        ends = np.stack([y_values[:, left], y_values[:, left + 1], mid_y])
+        defined = np.isfinite(ends)
+        with np.errstate(all='ignore'):
+            error = np.abs(mid_y - (y_values[:, left] + y_values[:, left + 1]) / 2)
+        # Refine bends, and edges of the domain where the function turns undefined
+        refine = np.where(defined.all(axis=0), error > ADAPTIVE_TOLERANCE * height,
+                          defined.any(axis=0))
+        
+        active[:, left] = refine
+        active = np.insert(active, left + 1, refine, axis=1)
+        x_values = np.insert(x_values, left + 1, mid_x)
+        y_values = np.insert(y_values, left + 1, mid_y, axis=1)
+    
+    # Intervals refinement could not split any more
+    narrow = np.diff(x_values) <= min_width
+    curves = []
+    for row, row_active, row_height in zip(y_values, active, height[:, 0]):
+        # An interval still jumping by more than the plot height against the trend
+        # on both sides straddles a pole (like 0 for 1/x), not a steep flank; one
+        # still unresolved at the smallest width is a jump (like 0 for x/|x|)
+        with np.errstate(all='ignore'):
+            steps = np.diff(row)
+            before = np.concatenate([[np.nan], steps[:-1]])
+            after = np.concatenate([steps[1:], [np.nan]])
+            against = (before * steps < 0) & (after * steps < 0)
+            jumps = np.abs(steps)
+            breaks = (against & (jumps > row_height)) | (narrow & (jumps > ADAPTIVE_TOLERANCE * row_height))
+            poles = np.flatnonzero(row_active & breaks & np.isfinite(steps))
+        
+        # Break the line across poles and jumps
+        curves.append((np.insert(x_values, poles + 1, (x_values[poles] + x_values[poles + 1]) / 2),
+                       np.insert(row, poles + 1, np.nan)))
+    return curves if rows else curves[0]
+
+
+# Range searched for the roots of expressions without polynomial structure,
+# and used when a function has no roots, extrema or poles at all
+AUTO_RANGE_WINDOW = (-10, 10)
+
+# Fraction of the span of the interesting points added on each side
+AUTO_RANGE_MARGIN = 0.25
+
+# Smallest margin added around the interesting points on the x axis
+AUTO_RANGE_MIN_MARGIN = 1.0
+
+# Fraction of the span of the function values added above and below
+AUTO_RANGE_Y_MARGIN = 0.05
+
+
+def _features(expression, var, window):
+    """Kind, real roots, critical points and poles of expression (see auto_range)"""
+    kind, num, den = classify(Eq(expression, 0), var)
+    # Polynomial structure gives every root, other expressions are searched
+    interval = window if kind == 'transcendental' else None
+    
+    roots = solve(Eq(expression, 0), var, interval=interval)
+    if kind == 'transcendental':
+        # From forward-mode slopes, which need no derivative rule for the
+        # expression (derivative() has none for varying exponents)
+        critical = critical_points(expression, var, *window)
+    else:
+        critical = solve(Eq(derivative(expression, var), 0), var)
+    
+    if kind == 'rational':
+        reduced = cancel_common(num, den)
+        poles = (reduced[1] if reduced else den).roots()
+    elif kind == 'transcendental':
+        poles = []
+        for node in postorder(expression):
+            if isinstance(node, Div):
+                poles += solve(Eq(node.right, 0), var, interval=window)
+            elif isinstance(node, Pow) and isinstance(node.exp, (int, float)) and node.exp < 0:
+                poles += solve(Eq(node.base, 0), var, interval=window)
+    else:
+        poles = []
+    return kind, roots, critical, poles
 
 
-def plot_function(expression, var_name='x', x_min=-10, x_max=10, points=500, title=None, export_path=None):
+def auto_range(expressions, var_name='x', x_min=None, x_max=None, derivatives=False):
+    """
+    Pick plot limits showing the interesting part of one or more functions
+    
+    The x range spans the real roots, critical points (roots of the
+    derivative) and poles of every function, with a margin. The y limits
+    span the function values at those points, at the ends of the range and
+    halfway between them; a polynomial takes its extreme values there, and
+    the values right at poles are left out so a pole does not flatten the
+    rest of the curve. They are only picked for polynomial and rational
+    functions over a range picked here: a transcendental function, or one
+    cut off by a given range, may peak elsewhere, so its plot scales to the
+    samples instead.
+    
+    Args:
+        expressions: Symbolic expression, or a list of them
+        var_name: Variable name (default 'x')
+        x_min: Minimum x value (None to pick it)
+        x_max: Maximum x value (None to pick it)
+        derivatives: Whether the y limits also span the derivatives, from
+            forward-mode values at the same points (default False)
+    
+    Returns:
+        tuple: (x_min, x_max, y_limits) where y_limits is (y_min, y_max), or
+            None when they are not picked or no function is defined anywhere
+            it was evaluated
+    """
+    if not isinstance(expressions, (list, tuple)):
+        expressions = [expressions]
+    var = symbols(var_name)
+    given = x_min is not None and x_max is not None
+    window = (x_min, x_max) if given else AUTO_RANGE_WINDOW
+    features = [_features(expression, var, window) for expression in expressions]
+    
+    if not given:
+        points = [x for kind, roots, critical, poles in features for x in roots + critical + poles]
+        if points:
+            low, high = min(points), max(points)
+            pad = max((high - low) * AUTO_RANGE_MARGIN, AUTO_RANGE_MIN_MARGIN)
+            low, high = low - pad, high + pad
+        else:
+            low, high = AUTO_RANGE_WINDOW
+        if x_min is None:
+            x_min = low if x_max is None or low < x_max else x_max - (high - low)
+        if x_max is None:
+            x_max = high if high > x_min else x_min + (high - low)
+    
+    if given or any(kind == 'transcendental' for kind, *_ in features):
+        return x_min, x_max, None
+    
+    values = []
+    for expression, (kind, roots, critical, poles) in zip(expressions, features):
+        # Features and ends, and halfway between them to see the rise to poles
+        points = sorted({x for x in roots + critical + poles if x_min < x < x_max} | {x_min, x_max})
+        halfway = [(a + b) / 2 for a, b in zip(points, points[1:])]
+        x_values = np.array([x for x in points if x not in poles] + halfway)
+        if derivatives:
+            y_values = evaluate_derivatives(expression, var, x_values).ravel()
+        else:
+            y_values = _evaluator(expression, var)(x_values)
+        values.extend(y_values[np.isfinite(y_values)].tolist())
+    if not values:
+        return x_min, x_max, None
+    
+    low, high = min(values), max(values)
+    pad = (high - low if high > low else max(abs(high), 1.0)) * AUTO_RANGE_Y_MARGIN
+    return x_min, x_max, (low - pad, high + pad)
+
+
+def plot_function(expression, var_name='x', x_min=None, x_max=None, points=500, title=None, export_path=None):
     """
     Plot a mathematical function over a specified range
     
     Args:
         expression: Symbolic expression or string to plot
         var_name: Variable name (default 'x')
-        x_min: Minimum x value (default -10)
-        x_max: Maximum x value (default 10)
-        points: Number of points to plot (default 500)
+        x_min: Minimum x value (default: picked by auto_range)
+        x_max: Maximum x value (default: picked by auto_range)
+        points: Maximum number of evaluations, spent adaptively where the curve bends (default 500)
         title: Plot title (optional)
         export_path: Path to save the plot (optional, e.g., 'plot.png')
     
     Returns:
-        None (displays the plot)
+        None (displays the plot, or saves it in headless mode)
     """
-    # Create x values
-    x_values = np.linspace(x_min, x_max, points)
-    y_values = []
-    
+    _show(_function_plot(expression, var_name, x_min, x_max, points, title), export_path)
+
+
+def _function_plot(expression, var_name, x_min, x_max, points, title):
+    """Sample one function into a plot description (see plot_function and _draw)"""
     # Get the variable symbol
     var = symbols(var_name)
     
-    # Evaluate the expression for each x value
-    for x_val in x_values:
-        try:
-            y_val = evaluate_expr(expression, var, x_val)
-            y_values.append(y_val)
-        except:
-            y_values.append(np.nan)  # Use NaN for undefined points
-    
-    # Create the plot
-    plt.figure(figsize=(10, 6))
-    plt.plot(x_values, y_values, 'b-', linewidth=2)
-    plt.grid(True, alpha=0.3)
-    plt.axhline(y=0, color='k', linewidth=0.5)
-    plt.axvline(x=0, color='k', linewidth=0.5)
-    plt.xlabel(var_name, fontsize=12)
-    plt.ylabel(f'f({var_name})', fontsize=12)
-    
-    if title:
-        plt.title(title, fontsize=14)
-    else:
-        plt.title(f'Plot of f({var_name}) = {expression}', fontsize=14)
+    # Limits around the roots, extrema and poles, before sampling
+    x_min, x_max, y_limits = auto_range(expression, var_name, x_min, x_max)
     
-    # Export if path is provided
-    if export_path:
-        plt.savefig(export_path, dpi=300, bbox_inches='tight')
-        print(f"Plot saved to {export_path}")
+    # Sample the expression (undefined points and poles become NaN)
+    x_values, y_values = adaptive_sample(_evaluator(expression, var), x_min, x_max, points)
     
-    plt.show()
+    return {
+        'curves': [(x_values, y_values)],
+        'labels': None,
+        'title': title or f'Plot of f({var_name}) = {expression}',
+        'var_name': var_name,
+        'y_limits': y_limits,
+    }
 
 
-def plot_multiple(expressions, var_name='x', x_min=-10, x_max=10, points=500, labels=None, title=None, export_path=None):
+def plot_multiple(expressions, var_name='x', x_min=None, x_max=None, points=500, labels=None, title=None, export_path=None):
     """
     Plot multiple mathematical functions on the same graph
     
     Args:
         expressions: List of symbolic expressions or strings
         var_name: Variable name (default 'x')
-        x_min: Minimum x value (default -10)
-        x_max: Maximum x value (default 10)
-        points: Number of points to plot (default 500)
+        x_min: Minimum x value (default: picked by auto_range)
+        x_max: Maximum x value (default: picked by auto_range)
+        points: Maximum number of evaluations per function (default 500)
         labels: List of labels for each function (optional)
         title: Plot title (optional)
         export_path: Path to save the plot (optional)
@@ -79,76 +547,138 @@ def plot_multiple(expressions, var_name='x', x_min=-10, x_max=10, points=500, la
     Returns:
         None (displays the plot)
     """
-    x_values = np.linspace(x_min, x_max, points)
     var = symbols(var_name)
+    x_min, x_max, y_limits = auto_range(expressions, var_name, x_min, x_max)
     
-    plt.figure(figsize=(10, 6))
-    
-    colors = ['b', 'r', 'g', 'orange', 'purple', 'brown', 'pink', 'gray', 'olive', 'cyan']
-    
-    for i, expression in enumerate(expressions):
-        y_values = []
-        
-        for x_val in x_values:
-            try:
-                y_val = evaluate_expr(expression, var, x_val)
-                y_values.append(y_val)
-            except:
-                y_values.append(np.nan)
-        
-        color = colors[i % len(colors)]
-        label = labels[i] if labels and i < len(labels) else f'f{i+1}({var_name})'
-        plt.plot(x_values, y_values, color=color, linewidth=2, label=label)
-    
-    plt.grid(True, alpha=0.3)
-    plt.axhline(y=0, color='k', linewidth=0.5)
-    plt.axvline(x=0, color='k', linewidth=0.5)
-    plt.xlabel(var_name, fontsize=12)
-    plt.ylabel(f'f({var_name})', fontsize=12)
-    plt.legend()
-    
-    if title:
-        plt.title(title, fontsize=14)
-    else:
-        plt.title('Multiple Functions', fontsize=14)
-    
-    if export_path:
-        plt.savefig(export_path, dpi=300, bbox_inches='tight')
-        print(f"Plot saved to {export_path}")
-    
-    plt.show()
+    curves = [adaptive_sample(_evaluator(expression, var), x_min, x_max, points)
+              for expression in expressions]
+    _plot_curves(curves, var_name, labels, title, export_path, y_limits)
+
 
+def _plot_curves(curves, var_name, labels, title, export_path, y_limits=None):
+    """Show already sampled (x_values, y_values) curves on one graph (see plot_multiple)"""
+    _show({
+        'curves': curves,
+        'labels': [labels[i] if labels and i < len(labels) else f'f{i+1}({var_name})'
+                   for i in range(len(curves))],
+        'title': title or 'Multiple Functions',
+        'var_name': var_name,
+        'y_limits': y_limits,
+    }, export_path)
 
-def plot_derivative_comparison(expression, var_name='x', x_min=-10, x_max=10, points=500, export_path=None):
+
+def plot_derivative_comparison(expression, var_name='x', x_min=None, x_max=None, points=500, export_path=None):
     """
     Plot a function alongside its derivative
     
+    Both curves come from forward-mode evaluation, one pass per sampling
+    round. The plot limits come from the features of the function alone (the
+    roots of the derivative are its critical points), so the derivative
+    expression is never differentiated again.
+    
     Args:
         expression: Symbolic expression
         var_name: Variable name (default 'x')
-        x_min: Minimum x value (default -10)
-        x_max: Maximum x value (default 10)
-        points: Number of points to plot (default 500)
+        x_min: Minimum x value (default: picked by auto_range)
+        x_max: Maximum x value (default: picked by auto_range)
+        points: Maximum number of evaluations, each giving both curves (default 500)
         export_path: Path to save the plot (optional)
     """
-    from solver import derivative, simplify_derivative
-    
     var = symbols(var_name)
-    deriv_expr = simplify_derivative(derivative(expression, var))
-    
-    plot_multiple(
-        [expression, deriv_expr],
-        var_name=var_name,
-        x_min=x_min,
-        x_max=x_max,
-        points=points,
+    x_min, x_max, y_limits = auto_range(expression, var_name, x_min, x_max, derivatives=True)
+    
+    # Rows f and f' from one evaluation, refined where either curve bends
+    both = lambda x_values: evaluate_derivatives(expression, var, x_values)
+    
+    _plot_curves(
+        adaptive_sample(both, x_min, x_max, points),
+        var_name,
         labels=[f'f({var_name})', f"f'({var_name})"],
         title=f"Function and its Derivative",
-        export_path=export_path
+        export_path=export_path,
+        y_limits=y_limits
     )
 
 
-# TODO: Auto adapt the function's range, allow user to move around graph etc
+def export_batch(jobs, var_name='x', points=500, dpi=EXPORT_DPI, processes=None):
+    """
+    Render many plots to files, in parallel worker processes
+    
+    The jobs are spread over the workers, and each worker samples and renders
+    its share on one reused figure, without pyplot or windows. One worker
+    (the default on a single core) renders in this process instead.
+    
+    Args:
+        jobs: List of (expression, x_range, path) tuples; x_range is
+            (x_min, x_max), or None to pick it with auto_range, and the
+            extension of path picks the format (png, svg, pdf...)
+        var_name: Variable name (default 'x')
+        points: Maximum number of evaluations per plot (default 500)
+        dpi: Resolution of the files (default EXPORT_DPI)
+        processes: Number of worker processes (default: one per CPU core)
+    
+    Returns:
+        list: (path, seconds, error) for every job, in order; error is None
+            or the message of the exception that stopped the job
+    """
+    jobs = list(jobs)
+    start = time.perf_counter()
+    processes = min(processes or os.cpu_count() or 1, len(jobs))
+    
+    if processes <= 1:
+        results = _export_jobs(jobs, var_name, points, dpi)
+    else:
+        # Every worker gets every processes-th job, so slow runs of jobs are shared
+        workers = [_start_worker('_export_main', stdout=subprocess.PIPE) for _ in range(processes)]
+        for i, worker in enumerate(workers):
+            pickle.dump((jobs[i::processes], var_name, points, dpi), worker.stdin)
+            worker.stdin.close()
+        results = [None] * len(jobs)
+        for i, worker in enumerate(workers):
+            output = worker.stdout.read()
+            if worker.wait() == 0:
+                results[i::processes] = pickle.loads(output)
+            else:
+                results[i::processes] = [(path, 0.0, f"Export worker failed with exit code {worker.returncode}")
+                                         for expression, x_range, path in jobs[i::processes]]
+    
+    for path, seconds, error in results:
+        if error:
+            print(f"Error exporting {path}: {error}")
+        else:
+            print(f"Plot saved to {path} ({seconds:.2f} s)")
+    print(f"{len(jobs)} plots exported in {time.perf_counter() - start:.2f} s")
+    return results
+
+
+def _export_jobs(jobs, var_name, points, dpi):
+    """Render export jobs one after the other on a single figure (see export_batch)"""
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=FIGURE_SIZE)
+    results = []
+    for expression, x_range, path in jobs:
+        start = time.perf_counter()
+        try:
+            x_min, x_max = x_range or (None, None)
+            _save(_function_plot(expression, var_name, x_min, x_max, points, None), path, fig, dpi)
+            error = None
+        except Exception as e:
+            error = str(e)
+        results.append((path, time.perf_counter() - start, error))
+    return results
+
+
+def _export_main():
+    """Export worker entry point: pickled jobs on stdin, pickled results on stdout"""
+    output = sys.stdout.buffer
+    # Anything printed while rendering must not end up in the results
+    sys.stdout = sys.stderr
+    jobs, var_name, points, dpi = pickle.load(sys.stdin.buffer)
+    pickle.dump(_export_jobs(jobs, var_name, points, dpi), output)
+    output.flush()
+
+
+# TODO: Allow user to move around graph etc
 # TODO: Add interactive zooming and panning
 # TODO: Add support for parametric plots
 # TODO: Add 3D plotting capabilities
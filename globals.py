@@ -1 +1,8 @@
-ALLOW_RUN_COMMANDS = True # Wether you can add "!" prefix to an eval and run python code
\ No newline at end of file
+ALLOW_RUN_COMMANDS = True # Wether you can add "!" prefix to an eval and run python code
+DERIVATIVE_CACHE_SIZE = 4096 # Max number of (expression, variable) derivatives kept in memory
+SIMPLIFY_CACHE_SIZE = 4096 # Max number of simplified expressions kept in memory
+SOLVE_COMPLEX_ROOTS = False # Wether solve also lists the complex roots of polynomial equations
+LET_FORM_MIN_LENGTH = 200 # Results printed longer than this are shown with shared subexpressions named (let ... in ...)
+HEADLESS_PLOTS = False # Wether plots are saved to a file instead of opening a window (also set by the ANCALC_HEADLESS environment variable)
+HEADLESS_PLOT_PATH = "plot.png" # File headless plots are saved to when no export path is given
+BACKGROUND_PLOTS = True # Wether plot windows open in a separate render process, so the prompt returns without waiting for them to be closed
@@ -1,9 +1,8 @@
 import globals
 
-from symbolic_math import symbols, Eq
+from symbolic_math import symbols, Eq, let_form
 from solver import solve, derivative, simplify_derivative
 from utils import format_solution
-from draw import plot_function
 import re
 
 import custom_commands
@@ -74,7 +73,12 @@ Derivative Command:
             deriv = derivative(expr, var)
             simplified = simplify_derivative(deriv)
             
-            return f"d/d{var_name}({expr_str}) = {simplified}"
+            # Long results are easier to read with repeated parts named once
+            result = str(simplified)
+            if len(result) > globals.LET_FORM_MIN_LENGTH:
+                result = let_form(simplified)
+            
+            return f"d/d{var_name}({expr_str}) = {result}"
         
         # Check if it's a solve command
         if command.startswith("solve "):
@@ -84,21 +88,63 @@ Derivative Command:
             if "help" in eq_str.lower():
                 return """
 Solve Command:
-  Solves algebraic equations (linear and quadratic).
+  Solves algebraic equations (polynomials of any degree).
+  Complex roots are listed when SOLVE_COMPLEX_ROOTS = True.
   
-  Format:
+  Formats:
     - solve <equation>
+    - solve <equation> in <x_min> <x_max>
+    - solve <equation>; <equation>; ...  (linear systems)
+  
+  With a range, only the roots inside it are listed, and equations
+  that cannot be solved symbolically are solved numerically.
   
   Examples:
     - solve x**2 - 4 = 0
     - solve x**2 + 5*x + 6 = 0
     - solve 2*x + 4 = 0
+    - solve x**5 - 3*x + 1 = 0
+    - solve 2**x = 3 in -10 10
+    - solve 2*x + y = 3; x - y = 0
 """
             
+            # Optional search interval: "solve <equation> in <x_min> <x_max>"
+            interval = None
+            match = re.match(r'(.+)\s+in\s+(\S+)\s+(\S+)$', eq_str)
+            if match:
+                try:
+                    interval = (float(match.group(2)), float(match.group(3)))
+                except ValueError:
+                    return "Error: Format should be 'solve equation in x_min x_max'"
+                eq_str = match.group(1).strip()
+            
             # Parse the equation - expecting format like "x**2 - 4 = 0"
             if "=" not in eq_str:
                 return "Error: Equation must contain '='"
             
+            # Systems of linear equations: "solve 2*x + y = 3; x - y = 0"
+            if ";" in eq_str:
+                var_names = sorted(set(re.findall(r'\b([a-z])\b', eq_str)))
+                if not var_names:
+                    return "Error: No variable found in equation"
+                namespace = {name: symbols(name) for name in var_names}
+                
+                equations = []
+                for part in eq_str.split(";"):
+                    if not part.strip():
+                        continue
+                    sides = part.split("=")
+                    if len(sides) != 2:
+                        return "Error: Each equation must have exactly one '='"
+                    left_expr = eval(sides[0].strip(), {"__builtins__": {}}, namespace)
+                    right_expr = eval(sides[1].strip(), {"__builtins__": {}}, namespace)
+                    equations.append(Eq(left_expr, right_expr))
+                
+                solution = solve(equations, [namespace[name] for name in var_names])
+                if not solution:
+                    return "No unique solution found"
+                return ", ".join(f"{var} = {value}" for var, value in solution.items())
+            
             # Extract variable (look for single letter variables)
             var_matches = re.findall(r'\b([a-z])\b', eq_str)
             if not var_matches:
@@ -126,7 +172,7 @@ Solve Command:
             equation = Eq(left_expr, right_expr)
             
             # Solve
-            solutions = solve(equation, var)
+            solutions = solve(equation, var, complex_roots=globals.SOLVE_COMPLEX_ROOTS, interval=interval)
             
             if not solutions:
                 return "No solutions found"
@@ -147,7 +193,7 @@ Draw Command:
   Plots a mathematical function using matplotlib.
   
   Formats:
-    - draw <expression>
+    - draw <expression>  (range picked around the roots, extrema and poles)
     - draw <expression> <x_min> <x_max>
   
   Examples:
@@ -168,8 +214,8 @@ Draw Command:
             var_name = var_matches[0]  # Use first variable found
             var = symbols(var_name)
             
-            # Default range
-            x_min, x_max = -10, 10
+            # Default range (picked by the plot from the function's features)
+            x_min, x_max = None, None
             
             # Check if range is provided
             if len(parts) >= 3:
@@ -192,7 +238,8 @@ Draw Command:
             try:
                 expr = eval(expr_str, {"__builtins__": {}}, namespace)
                 
-                # Plot the function
+                # Plot the function (matplotlib is only loaded by the first plot)
+                from draw import plot_function
                 plot_function(
                     expr,
                     var_name=var_name,
@@ -201,6 +248,8 @@ Draw Command:
                     title=f"f({var_name}) = {expr_str}"
                 )
                 
+                if x_min is None:
+                    return f"Plotting f({var_name}) = {expr_str} over an automatic range"
                 return f"Plotting f({var_name}) = {expr_str} from {x_min} to {x_max}"
             except Exception as e:
                 return f"Error plotting: {e}"
@@ -232,8 +281,9 @@ Available Commands:
    - Examples: 5*5, 2+3, 10/2, 2**3
 
 2. solve <equation>
-   - Solves linear and quadratic equations
-   - Example: solve x**2 - 4 = 0
+   - Solves polynomial equations of any degree
+   - Example: solve x**2 - 4 = 0, solve 2**x = 3 in -10 10
+   - Systems: solve 2*x + y = 3; x - y = 0
    - Type 'solve help' for more info
 
 3. derivative/deriv/d/d<var> <expression>
@@ -249,6 +299,8 @@ Available Commands:
 5. Custom Commands (prefix with :)
    - :clear - Clear the screen
    - :reload - Reload the program
+   - :cache - Show derivative cache statistics
+   - :close - Close every plot window
 
 6. Execute Python (prefix with !)
    - !print("Hello") - Run Python code
@@ -271,24 +323,30 @@ For detailed help on a command, type: <command> help
 
 
 
-while True:
-    userInput: str = input("> ")  # Get input from user
-    results = []
-    
-    if not userInput.strip():
-        continue
+def main():
+    """Read-eval-print loop"""
+    while True:
+        userInput: str = input("> ")  # Get input from user
+        results = []
+        
+        if not userInput.strip():
+            continue
+
+        # Convert userInput to usable commands
+        # Split by " | " for async commands
+        async_groups = userInput.split(" | ")
+        for async_group in async_groups:
+            # Split by " & " for stacked commands within each group
+            commands = async_group.split(" & ")
+            for command in commands:
+                result = process_command(command)
+                if result is not None:
+                    results.append(result)
+        
+        # Output results
+        for result in results:
+            print(result)
+
 
-    # Convert userInput to usable commands
-    # Split by " | " for async commands
-    async_groups = userInput.split(" | ")
-    for async_group in async_groups:
-        # Split by " & " for stacked commands within each group
-        commands = async_group.split(" & ")
-        for command in commands:
-            result = process_command(command)
-            if result is not None:
-                results.append(result)
-    
-    # Output results
-    for result in results:
-        print(result)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
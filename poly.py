@@ -0,0 +1,679 @@
+"""
+Sparse univariate polynomials for AnCalc
+Fast arithmetic, differentiation and Horner evaluation for polynomial expressions
+"""
+
+from fractions import Fraction
+from math import gcd
+
+from symbolic_math import Expr, Add, Sub, Mul, Div, Pow, Symbol, fold
+from utils import LazyModule
+
+np = LazyModule('numpy')
+
+
+# Products of polynomials with at least this many terms use NumPy convolution
+CONVOLVE_MIN_TERMS = 64
+
+# Newton polishing steps applied to every eigenvalue root
+POLISH_ITERATIONS = 8
+
+# Roots closer than this (relative) may be one multiple root; multiple roots
+# come out of the eigenvalue solver as a small cluster of size
+# ~eps**(1/multiplicity)
+ROOT_MERGE_TOL = 1e-5
+
+# A cluster of float roots is merged only if the polynomial vanishes at its
+# mean to this relative precision, so no evaluation can tell its roots apart
+ROOT_MERGE_RESIDUAL = 1e-14
+
+# Newton steps in exact arithmetic on the close real roots of exact polynomials
+EXACT_NEWTON_STEPS = 2
+
+# Roots with a smaller imaginary part than this (relative) are real
+REAL_ROOT_TOL = 1e-9
+
+
+class Poly:
+    """
+    Polynomial in one variable, stored sparsely as {exponent: coefficient}
+
+    Coefficients are plain numbers; integer coefficients stay exact.
+    """
+    __slots__ = ('terms',)
+
+    def __init__(self, terms=None):
+        self.terms = {e: c for e, c in (terms or {}).items() if c != 0}
+
+    @classmethod
+    def from_coeffs(cls, coeffs):
+        """Build from dense coefficients, highest degree first (NumPy order)"""
+        degree = len(coeffs) - 1
+        return cls({degree - i: c for i, c in enumerate(coeffs)})
+
+    @property
+    def degree(self):
+        """Degree of the polynomial (0 for constants, including zero)"""
+        return max(self.terms) if self.terms else 0
+
+    def coeffs(self):
+        """Dense coefficients, highest degree first (NumPy order)"""
+        return [self.terms.get(e, 0) for e in range(self.degree, -1, -1)]
+
+    def __getitem__(self, exponent):
+        return self.terms.get(exponent, 0)
+
+    def is_zero(self):
+        return not self.terms
+
+    def __add__(self, other):
+        if not isinstance(other, Poly):
+            other = Poly({0: other})
+        terms = dict(self.terms)
+        for e, c in other.terms.items():
+            terms[e] = terms.get(e, 0) + c
+        return Poly(terms)
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return Poly({e: -c for e, c in self.terms.items()})
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __rsub__(self, other):
+        return (-self) + other
+
+    def __mul__(self, other):
+        if not isinstance(other, Poly):
+            return Poly({e: c * other for e, c in self.terms.items()})
+
+        if self._convolvable(other):
+            product = np.convolve(np.array(self.coeffs(), dtype=float),
+                                  np.array(other.coeffs(), dtype=float))
+            return Poly.from_coeffs(product.tolist())
+
+        terms = {}
+        for e1, c1 in self.terms.items():
+            for e2, c2 in other.terms.items():
+                terms[e1 + e2] = terms.get(e1 + e2, 0) + c1 * c2
+        return Poly(terms)
+
+    __rmul__ = __mul__
+
+    def _convolvable(self, other):
+        """Whether the product should go through dense float convolution"""
+        # Dense enough to be worth it, and already inexact (ints stay exact)
+        polys = (self, other)
+        if any(len(p.terms) < CONVOLVE_MIN_TERMS for p in polys):
+            return False
+        if any(len(p.terms) * 4 < p.degree + 1 for p in polys):
+            return False
+        coefficients = [c for p in polys for c in p.terms.values()]
+        return all(isinstance(c, (int, float)) for c in coefficients) and \
+            any(isinstance(c, float) for c in coefficients)
+
+    def __pow__(self, n):
+        """Raise to a non-negative integer power by repeated squaring"""
+        result = Poly({0: 1})
+        base = self
+        while n:
+            if n & 1:
+                result = result * base
+            n >>= 1
+            if n:
+                base = base * base
+        return result
+
+    def __divmod__(self, other):
+        """Quotient and remainder of polynomial long division"""
+        if other.is_zero():
+            raise ZeroDivisionError("polynomial division by zero")
+        quotient = {}
+        remainder = Poly(self.terms)
+        lead_exp = other.degree
+        lead = other.terms[lead_exp]
+        exact = isinstance(lead, (int, Fraction))
+        while not remainder.is_zero() and remainder.degree >= lead_exp:
+            exp = remainder.degree - lead_exp
+            coeff = remainder.terms[remainder.degree]
+            coeff = Fraction(coeff, lead) if exact and isinstance(coeff, (int, Fraction)) else coeff / lead
+            quotient[exp] = coeff
+            terms = dict(remainder.terms)
+            for e, c in other.terms.items():
+                terms[e + exp] = terms.get(e + exp, 0) - coeff * c
+            # The leading term cancels exactly, even with float coefficients
+            del terms[remainder.degree]
+            remainder = Poly(terms)
+        return Poly(quotient), remainder
+
+    def __floordiv__(self, other):
+        return divmod(self, other)[0]
+
+    def __mod__(self, other):
+        return divmod(self, other)[1]
+
+    def monic(self):
+        """Same polynomial scaled to a leading coefficient of 1"""
+        if self.is_zero():
+            return self
+        lead = self.terms[self.degree]
+        if isinstance(lead, (int, Fraction)):
+            return Poly({e: Fraction(c) / lead for e, c in self.terms.items()})
+        return Poly({e: c / lead for e, c in self.terms.items()})
+
+    def is_exact(self):
+        """Whether every coefficient is an integer or a Fraction"""
+        return all(isinstance(c, (int, Fraction)) for c in self.terms.values())
+
+    def gcd(self, other):
+        """
+        Monic greatest common divisor
+
+        Exact for integer and Fraction coefficients, through a primitive
+        remainder sequence over the integers, whose coefficients stay small.
+        Float coefficients use Euclid's algorithm, and only give a meaningful
+        result when the remainders cancel exactly.
+        """
+        if self.is_exact() and other.is_exact():
+            a, b = _integer_coeffs(self), _integer_coeffs(other)
+            if len(a) < len(b):
+                a, b = b, a
+            while b:
+                a, b = b, _primitive(_pseudo_remainder(a, b))
+            if not a:
+                return Poly({})
+            return Poly({len(a) - 1 - i: c for i, c in enumerate(a) if c}).monic()
+        a, b = self, other
+        while not b.is_zero():
+            a, b = b, a % b
+        return a.monic()
+
+    def squarefree(self):
+        """The polynomial with every repeated factor reduced to a single one"""
+        common = self.gcd(self.deriv())
+        if common.degree == 0:
+            return self
+        return self // common
+
+    def deriv(self):
+        """Derivative, in O(degree)"""
+        return Poly({e - 1: c * e for e, c in self.terms.items() if e > 0})
+
+    def __call__(self, x):
+        """Evaluate at x (a number or a NumPy array) with Horner's scheme"""
+        if not self.terms:
+            return 0 * x
+        exponents = sorted(self.terms, reverse=True)
+        result = self.terms[exponents[0]]
+        # Sparse Horner: jump over missing exponents with a single power
+        for high, low in zip(exponents, exponents[1:]):
+            gap = high - low
+            result = result * (x if gap == 1 else x ** gap) + self.terms[low]
+        if exponents[-1]:
+            result = result * x ** exponents[-1]
+        return result
+
+    def roots(self, complex_roots=False):
+        """
+        Roots of the polynomial, of any degree
+
+        Eigenvalues of the companion matrix, refined by Newton polishing.
+        Multiple roots are returned once: an exact polynomial is solved
+        through its square-free part (whose roots are all simple), while the
+        clusters of nearby eigenvalues of a float polynomial are merged if it
+        vanishes at their mean.
+
+        Args:
+            complex_roots: Also return the non-real roots
+
+        Returns:
+            list: Real roots as sorted floats, followed by the complex roots
+                sorted by real then imaginary part when complex_roots is set
+        """
+        if not self.terms or self.degree == 0:
+            return []
+
+        poly = self
+        if all(isinstance(c, float) and c.is_integer() for c in self.terms.values()):
+            poly = Poly({e: int(c) for e, c in self.terms.items()})
+
+        # Multiple roots are ill-conditioned as eigenvalues (a k-fold root
+        # spreads by about eps**(1/k)), so exact polynomials are always
+        # solved through their square-free part, whose roots are all simple
+        if poly.is_exact():
+            poly = poly.squarefree()
+        found = poly._eigen_roots()
+        close = _clustered(found)
+        if close.any():
+            if poly.is_exact():
+                # Close simple roots are still only as accurate as float
+                # evaluation near them allows
+                found = [complex(_refine_exact(poly, z.real)) if near and
+                         abs(z.imag) <= REAL_ROOT_TOL * max(1.0, abs(z)) else z
+                         for z, near in zip(found, close)]
+            else:
+                found = _merge_roots(found, poly)
+
+        real = sorted(float(z.real) for z in found
+                      if abs(z.imag) <= REAL_ROOT_TOL * max(1.0, abs(z)))
+        if not complex_roots:
+            return real
+        other = sorted((_clean(complex(z)) for z in found
+                        if abs(z.imag) > REAL_ROOT_TOL * max(1.0, abs(z))),
+                       key=lambda z: (z.real, z.imag))
+        return real + other
+
+    def _eigen_roots(self):
+        """Polished companion matrix eigenvalues, with a zero root listed once"""
+        # Factor out x**low: zero is a root and the rest has a nonzero constant
+        low = min(self.terms)
+        coeffs = np.array([float(self.terms.get(e, 0))
+                           for e in range(self.degree, low - 1, -1)])
+        found = [0j] if low else []
+
+        if len(coeffs) > 1:
+            n = len(coeffs) - 1
+            companion = np.zeros((n, n))
+            companion[0, :] = -coeffs[1:] / coeffs[0]
+            companion[np.arange(1, n), np.arange(n - 1)] = 1
+            with np.errstate(all='ignore'):
+                found.extend(_polish(coeffs, np.linalg.eigvals(companion).astype(complex)).tolist())
+        return found
+
+    def to_expr(self, var):
+        """Convert back to an expression in var"""
+        terms = []
+        for e, c in self.terms.items():
+            if e == 0:
+                terms.append(c)
+            elif e == 1:
+                terms.append(Mul(c, var))
+            else:
+                terms.append(Mul(c, Pow(var, e)))
+        return Add(*terms)
+
+    def __eq__(self, other):
+        if not isinstance(other, Poly):
+            other = Poly({0: other})
+        return self.terms == other.terms
+
+    def __repr__(self):
+        return f"Poly({self.terms})"
+
+
+def _horner(coeffs, z):
+    """
+    Evaluate polynomials at many points
+
+    coeffs has shape (..., m), highest degree first, and z shape (..., k):
+    each row of coefficients is evaluated at the matching row of points.
+    """
+    result = np.zeros(np.broadcast_shapes(coeffs.shape[:-1] + (1,), z.shape), dtype=z.dtype)
+    for i in range(coeffs.shape[-1]):
+        result = result * z + coeffs[..., i, None]
+    return result
+
+
+def _polish(coeffs, z):
+    """Newton steps on all roots at once, keeping a step only if it helps"""
+    degree = coeffs.shape[-1] - 1
+    derivative = coeffs[..., :-1] * np.arange(degree, 0, -1)
+    value = _horner(coeffs, z)
+    for _ in range(POLISH_ITERATIONS):
+        slope = _horner(derivative, z)
+        step = np.where(slope != 0, value / np.where(slope != 0, slope, 1), 0)
+        candidate = z - step
+        candidate_value = _horner(coeffs, candidate)
+        better = np.abs(candidate_value) < np.abs(value)
+        if not better.any():
+            break
+        z = np.where(better, candidate, z)
+        value = np.where(better, candidate_value, value)
+    return z
+
+
+def _clean(z):
+    """Drop a rounding-level real part, so 1j does not print as (-1e-18+1j)"""
+    if abs(z.real) <= REAL_ROOT_TOL * abs(z):
+        return complex(0.0, z.imag)
+    return z
+
+
+def _clustered(z):
+    """Mask of the roots with another root closer than ROOT_MERGE_TOL (relative)"""
+    z = np.array(z, dtype=complex)
+    distance = np.abs(z[:, None] - z[None, :])
+    np.fill_diagonal(distance, np.inf)
+    return (distance <= ROOT_MERGE_TOL * np.maximum(1.0, np.abs(z))[:, None]).any(axis=1)
+
+
+def _refine_exact(poly, root):
+    """Newton steps on a real root of an exact Poly, evaluated in exact arithmetic"""
+    slope_poly = poly.deriv()
+    for _ in range(EXACT_NEWTON_STEPS):
+        r = Fraction(root)
+        slope = slope_poly(r)
+        if slope == 0:
+            break
+        root = float(r - poly(r) / slope)
+    return root
+
+
+def _merge_roots(z, poly):
+    """
+    Replace each cluster of nearby roots by its mean, where poly vanishes at
+    the mean to rounding precision; other close roots are distinct and kept
+    """
+    merged = []
+    for root in sorted(z, key=lambda r: (r.real, r.imag)):
+        for cluster in merged:
+            center = (sum(cluster) + root) / (len(cluster) + 1)
+            scale = sum(abs(c) * abs(center) ** e for e, c in poly.terms.items())
+            if abs(root - cluster[0]) <= ROOT_MERGE_TOL * max(1.0, abs(center)) and \
+                    abs(poly(center)) <= ROOT_MERGE_RESIDUAL * scale:
+                cluster.append(root)
+                break
+        else:
+            merged.append([root])
+    return [sum(cluster) / len(cluster) for cluster in merged]
+
+
+def _integer_coeffs(poly):
+    """Dense primitive integer coefficients (highest degree first) of an exact Poly"""
+    if poly.is_zero():
+        return []
+    scale = 1
+    for c in poly.terms.values():
+        denominator = Fraction(c).denominator
+        scale = scale * denominator // gcd(scale, denominator)
+    return _primitive([int(Fraction(poly.terms.get(e, 0)) * scale)
+                       for e in range(poly.degree, -1, -1)])
+
+
+def _primitive(coeffs):
+    """Integer coefficients divided by their content, leading one positive"""
+    content = 0
+    for c in coeffs:
+        content = gcd(content, c)
+    if coeffs and coeffs[0] < 0:
+        content = -content
+    return [c // content for c in coeffs] if content else coeffs
+
+
+def _pseudo_remainder(a, b):
+    """Remainder of lead(b)**k * a divided by b, in integers (dense, highest first)"""
+    a = list(a)
+    lead = b[0]
+    while len(a) >= len(b):
+        q = a[0]
+        a = [lead * c for c in a]
+        for i, c in enumerate(b):
+            a[i] -= q * c
+        # The leading coefficient cancels; drop it and any zeros after it
+        a.pop(0)
+        while a and a[0] == 0:
+            a.pop(0)
+    return a
+
+
+def is_expanded(expr, var):
+    """
+    Whether expr is a polynomial in var written out in monomials
+
+    Numbers, c * var**k and sums and differences of them. Other polynomials,
+    like (x - 1.1)**40, are better differentiated and evaluated as written:
+    expanding them loses everything to cancellation near their roots.
+
+    Args:
+        expr: Expression (or number) to check
+        var: Symbol of the polynomial
+
+    Returns:
+        bool
+    """
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (Add, Sub)):
+            stack.extend(node.args)
+            continue
+        factors = node.args if isinstance(node, Mul) else (node,)
+        powers = [f for f in factors if isinstance(f, Expr)]
+        if len(powers) > 1:
+            return False
+        for factor in powers:
+            if isinstance(factor, Pow):
+                base, exp = factor.base, factor.exp
+                if base is not var or not isinstance(exp, int) or exp < 0:
+                    return False
+            elif factor is not var:
+                return False
+    return True
+
+
+def to_poly(expr, var, max_degree=1000, symbolic=False):
+    """
+    Convert an expression to a Poly in var
+
+    Args:
+        expr: Expression (or number) to convert
+        var: Symbol of the polynomial
+        max_degree: Give up on expansions above this degree
+        symbolic: Treat other symbols as parameters, giving coefficients that
+            are expressions in them (a*x**2 + b*x -> {2: a, 1: b})
+
+    Returns:
+        Poly, or None if expr is not a polynomial in var with numeric
+        (or, if symbolic, parametric) coefficients
+    """
+    def visit(node, args):
+        if isinstance(node, Symbol):
+            if node is var:
+                return Poly({1: 1})
+            return Poly({0: node}) if symbolic else None
+        if any(arg is None for arg in args):
+            return None
+
+        if isinstance(node, Add):
+            result = args[0]
+            for arg in args[1:]:
+                result = result + arg
+            return result
+
+        if isinstance(node, Sub):
+            return args[0] - args[1]
+
+        if isinstance(node, Mul):
+            if sum(arg.degree for arg in args) > max_degree:
+                return None
+            result = args[0]
+            for arg in args[1:]:
+                result = result * arg
+            return result
+
+        if isinstance(node, Div):
+            num, den = args
+            # Only division by a nonzero constant keeps a polynomial
+            if den.degree > 0 or den.is_zero():
+                return None
+            return num * (1 / den[0])
+
+        if isinstance(node, Pow):
+            base, exp = args
+            if exp.degree > 0:
+                return None
+            n = exp[0]
+            if isinstance(n, float) and n.is_integer():
+                n = int(n)
+            if not isinstance(n, int) or n < 0 or base.degree * n > max_degree:
+                return None
+            return base ** n
+
+        return None
+
+    def leaf(value):
+        return Poly({0: value}) if isinstance(value, (int, float)) else None
+
+    return fold(expr, visit, leaf=leaf)
+
+
+def to_rational(expr, var, max_degree=1000):
+    """
+    Convert an expression to a ratio of Polys in var
+
+    Args:
+        expr: Expression (or number) to convert
+        var: Symbol of the rational function
+        max_degree: Give up on expansions above this degree
+
+    Returns:
+        (numerator, denominator) Polys, the denominator being 1 for
+        polynomials, or None if expr is not a rational function of var with
+        numeric coefficients
+    """
+    one = Poly({0: 1})
+
+    def make(num, den):
+        # Constant denominators are folded into the numerator
+        if den.degree == 0:
+            return (num if den[0] == 1 else num * (1 / den[0]), one)
+        if num.degree + den.degree > max_degree:
+            return None
+        return (num, den)
+
+    def add(a, b):
+        if a[1] is one and b[1] is one:
+            return (a[0] + b[0], one)
+        return make(a[0] * b[1] + b[0] * a[1], a[1] * b[1])
+
+    def visit(node, args):
+        if isinstance(node, Symbol):
+            return (Poly({1: 1}), one) if node is var else None
+        if any(arg is None for arg in args):
+            return None
+
+        if isinstance(node, Add):
+            result = args[0]
+            for arg in args[1:]:
+                result = add(result, arg)
+                if result is None:
+                    return None
+            return result
+
+        if isinstance(node, Sub):
+            num, den = args[1]
+            return add(args[0], (-num, den))
+
+        if isinstance(node, Mul):
+            if sum(num.degree + den.degree for num, den in args) > max_degree:
+                return None
+            num, den = args[0]
+            for arg in args[1:]:
+                num, den = num * arg[0], den * arg[1]
+            return make(num, den)
+
+        if isinstance(node, Div):
+            (num1, den1), (num2, den2) = args
+            if num2.is_zero():
+                return None
+            return make(num1 * den2, den1 * num2)
+
+        if isinstance(node, Pow):
+            (num, den), exp = args
+            if exp[1] is not one or exp[0].degree > 0:
+                return None
+            n = exp[0][0]
+            if isinstance(n, float) and n.is_integer():
+                n = int(n)
+            if not isinstance(n, int) or (num.degree + den.degree) * abs(n) > max_degree:
+                return None
+            if n < 0:
+                if num.is_zero():
+                    return None
+                num, den, n = den, num, -n
+            return make(num ** n, den ** n)
+
+        return None
+
+    def leaf(value):
+        return (Poly({0: value}), one) if isinstance(value, (int, float)) else None
+
+    return fold(expr, visit, leaf=leaf)
+
+
+def cancel_common(num, den):
+    """
+    Cancel the common factors of a ratio of Polys
+
+    Float coefficients are taken at their exact binary value, so the GCD is
+    exact; results are converted back to ints (with a positive, content-free
+    denominator) when the input coefficients were integers, and to floats
+    with a monic denominator otherwise.
+
+    Args:
+        num, den: Numerator and denominator Polys
+
+    Returns:
+        (numerator, denominator) without common factors, or None if nothing
+        cancels
+    """
+    coefficients = list(num.terms.values()) + list(den.terms.values())
+    if not all(isinstance(c, (int, float, Fraction)) for c in coefficients):
+        return None
+    integral = all(isinstance(c, int) or (isinstance(c, float) and c.is_integer())
+                   for c in coefficients)
+
+    exact_num = Poly({e: Fraction(c) for e, c in num.terms.items()})
+    exact_den = Poly({e: Fraction(c) for e, c in den.terms.items()})
+    common = exact_num.gcd(exact_den)
+    if common.degree == 0:
+        return None
+    num, den = exact_num // common, exact_den // common
+
+    if not integral:
+        lead = den.terms[den.degree]
+        return (Poly({e: float(c / lead) for e, c in num.terms.items()}),
+                Poly({e: float(c / lead) for e, c in den.terms.items()}))
+
+    # Clear the denominators of the Fractions, then the common content
+    scale = 1
+    for c in list(num.terms.values()) + list(den.terms.values()):
+        scale = scale * c.denominator // gcd(scale, c.denominator)
+    num = {e: int(c * scale) for e, c in num.terms.items()}
+    den = {e: int(c * scale) for e, c in den.terms.items()}
+    content = 0
+    for c in list(num.values()) + list(den.values()):
+        content = gcd(content, c)
+    if den[max(den)] < 0:
+        content = -content
+    return (Poly({e: c // content for e, c in num.items()}),
+            Poly({e: c // content for e, c in den.items()}))
+
+
+def cancel(expr, var, max_degree=1000):
+    """
+    Cancel the common factors of a rational function of var
+
+    x**2 / x -> x, (x**2 - 1) / (x - 1) -> x + 1
+
+    Args:
+        expr: Expression (or number)
+        var: Symbol of the rational function
+        max_degree: Give up on expansions above this degree
+
+    Returns:
+        The reduced expression, or expr itself if it is not a rational
+        function of var or nothing cancels
+    """
+    rational = to_rational(expr, var, max_degree)
+    if rational is None or rational[1].degree == 0:
+        return expr
+    reduced = cancel_common(*rational)
+    if reduced is None:
+        return expr
+    num, den = reduced
+    if den.degree == 0:
+        return (num * (1 / den[0]) if den[0] != 1 else num).to_expr(var)
+    return Div(num.to_expr(var), den.to_expr(var))
@@ -1,227 +1,795 @@
-from symbolic_math import Pow, Add, Sub, Mul, Div, Symbol, Eq
+import operator
+import warnings
+
+import globals
+from symbolic_math import Expr, Pow, Add, Sub, Mul, Div, Symbol, Eq, fold, free_symbols
+from poly import to_poly, to_rational, cancel, cancel_common, is_expanded, REAL_ROOT_TOL, _polish
+from utils import LRUCache, LazyModule
+
+np = LazyModule('numpy')
+
+
+_PYTHON_OPS = {Add: operator.add, Sub: operator.sub, Mul: operator.mul, Div: operator.truediv, Pow: operator.pow}
+
+
+def _apply(expr, values):
+    """Apply the operator of expr to already evaluated operands"""
+    op = _PYTHON_OPS[type(expr)]
+    result = values[0]
+    for value in values[1:]:
+        result = op(result, value)
+    return result
 
 
 def simplify_expr(expr, var):
-    """Recursively simplify expression by evaluating constants"""
-    if isinstance(expr, (int, float)):
-        return expr
-    
-    if isinstance(expr, Symbol):
-        return expr
-    
-    if isinstance(expr, Add):
-        left = simplify_expr(expr.left, var)
-        right = simplify_expr(expr.right, var)
-        if isinstance(left, (int, float)) and isinstance(right, (int, float)):
-            return left + right
-        return Add(left, right)
+    """Simplify expression (see simplify)"""
+    return simplify(expr)
+
+
+def _is_number(value, number=None):
+    """Whether value is a number (equal to number, if given)"""
+    return isinstance(value, (int, float)) and (number is None or value == number)
+
+
+def _merge_quotient_powers(node):
+    """x**3 / x -> x**2, (2*x) / x -> 2: keep a/b as a * b**-1 when nothing stays in the denominator"""
+    left, right = node.args
+    if _is_number(right):
+        return None
+    num_coeff, num = _split_coefficient(left)
+    den_coeff, den = _split_coefficient(right)
+    # Keep integer coefficients exact: (6*x**3) / (2*x) -> 3*x**2
+    if isinstance(num_coeff, int) and isinstance(den_coeff, int) and num_coeff % den_coeff == 0:
+        coeff = num_coeff // den_coeff
+    else:
+        coeff = num_coeff / den_coeff
+    product = Mul(coeff, num, _reciprocal(den))
+    factors = product.args if isinstance(product, Mul) else (product,)
+    if any(isinstance(f, Pow) and _is_number(f.exp) and f.exp < 0 for f in factors):
+        return None
+    return product
+
+
+def _split_coefficient(expr):
+    """(numeric coefficient, rest) of a product: 2*x*y -> (2, x*y)"""
+    if _is_number(expr):
+        return expr, 1
+    if isinstance(expr, Mul) and _is_number(expr.args[0]):
+        return expr.args[0], Mul(*expr.args[1:])
+    return 1, expr
+
+
+def _reciprocal(expr):
+    """expr**-1 with numeric powers merged: (2*x**2)**-1 -> 0.5*x**-2"""
+    if isinstance(expr, Mul):
+        return Mul(*[_reciprocal(factor) for factor in expr.args])
+    if _is_number(expr):
+        return 1 / expr
+    if isinstance(expr, Pow) and _is_number(expr.exp):
+        return Pow(expr.base, -expr.exp)
+    return Pow(expr, -1)
+
+
+def _merge_powers(node):
+    """(x**a)**n -> x**(a*n), (a*b)**n -> a**n * b**n, for integer n"""
+    base, exp = node.args
+    if not (isinstance(exp, int) or (isinstance(exp, float) and exp.is_integer())):
+        return None
+    if isinstance(base, Pow):
+        return Pow(base.base, Mul(base.exp, exp))
+    if isinstance(base, Mul):
+        return Mul(*[Pow(factor, exp) for factor in base.args])
+    return None
+
+
+# Rewrite rules by node type, tried in order on a node whose args are
+# already simplified. A rule returns a simpler equivalent expression, or None
+# if it does not apply. Constant folding, identities (x + 0, x * 1, x**1 ...),
+# like-term collection (differences are sums too) and merging powers inside a
+# product are done by the node constructors when nodes are rebuilt.
+SIMPLIFY_RULES = {
+    Div: [_merge_quotient_powers],
+    Pow: [_merge_powers],
+}
+
+# Simplified form of every node seen with the default rules
+simplify_cache = LRUCache(maxsize=globals.SIMPLIFY_CACHE_SIZE)
+
+
+def simplify(expr, rules=None):
+    """
+    Simplify an expression with rewrite rules, bottom-up to a fixed point
     
-    if isinstance(expr, Sub):
-        left = simplify_expr(expr.left, var)
-        right = simplify_expr(expr.right, var)
-        if isinstance(left, (int, float)) and isinstance(right, (int, float)):
-            return left - right
-        return Sub(left, right)
+    Every distinct node is visited once: it is rebuilt from its simplified
+    args (so Add and Mul collect like terms), then the rules for its type
+    are applied until none matches. Results are memoized per node, so the
+    cost is linear in the size of the DAG and repeated calls are cheap.
     
-    if isinstance(expr, Mul):
-        left = simplify_expr(expr.left, var)
-        right = simplify_expr(expr.right, var)
-        if isinstance(left, (int, float)) and isinstance(right, (int, float)):
-            return left * right
-        return Mul(left, right)
+    Args:
+        expr: Expression (or number) to simplify
+        rules: Rule table {node type: [rule, ...]} (default SIMPLIFY_RULES;
+            call simplify_cache.clear() after changing it in place)
     
-    if isinstance(expr, Div):
-        left = simplify_expr(expr.left, var)
-        right = simplify_expr(expr.right, var)
-        if isinstance(left, (int, float)) and isinstance(right, (int, float)):
-            return left / right
-        return Div(left, right)
+    Returns:
+        The simplified expression
+    """
+    if rules is None:
+        return _simplify(expr, SIMPLIFY_RULES, simplify_cache)
+    return _simplify(expr, rules, LRUCache(maxsize=globals.SIMPLIFY_CACHE_SIZE))
+
+
+def _simplify(expr, rules, cache):
+    """simplify with an explicit rule table and memo cache"""
+    def visit(node, args):
+        result = node if isinstance(node, Symbol) else type(node)(*args)
+        result = _rewrite(result, rules, cache)
+        cache.put(node, result)
+        return result
     
-    if isinstance(expr, Pow):
-        base = simplify_expr(expr.base, var)
-        exp = simplify_expr(expr.exp, var)
-        if isinstance(base, (int, float)) and isinstance(exp, (int, float)):
-            return base ** exp
-        return Pow(base, exp)
+    def lookup(node):
+        return cache.get(node)
     
-    return expr
+    return fold(expr, visit, lookup=lookup)
+
+
+def _rewrite(node, rules, cache):
+    """Apply the rules to the top of node until none matches"""
+    while isinstance(node, Expr):
+        for rule in rules.get(type(node), ()):
+            result = rule(node)
+            if result is not None and result is not node:
+                break
+        else:
+            return node
+        if not isinstance(result, Expr) or isinstance(result, Symbol):
+            return result
+        # A rule may build new nodes under the top one: simplify those too
+        # (parts that were already simplified are cache hits)
+        node = type(result)(*[_simplify(arg, rules, cache) for arg in result.args])
+    return node
 
 
 def evaluate_expr(expr, var, value):
     """Evaluate expression by substituting var with value"""
-    if isinstance(expr, (int, float)):
-        return expr
-    
-    if isinstance(expr, Symbol):
-        if expr.name == var.name:
-            return value
-        return expr
-    
-    if isinstance(expr, Add):
-        return evaluate_expr(expr.left, var, value) + evaluate_expr(expr.right, var, value)
-    
-    if isinstance(expr, Sub):
-        return evaluate_expr(expr.left, var, value) - evaluate_expr(expr.right, var, value)
+    def visit(node, values):
+        if isinstance(node, Symbol):
+            return value if node is var else node
+        return _apply(node, values)
     
-    if isinstance(expr, Mul):
-        return evaluate_expr(expr.left, var, value) * evaluate_expr(expr.right, var, value)
+    return fold(expr, visit)
+
+
+# Compiled functions, keyed by (expr, variable names, numpy mode)
+_compile_cache = {}
+_COMPILE_CACHE_SIZE = 256
+
+_OPERATORS = {Add: '+', Sub: '-', Mul: '*', Div: '/', Pow: '**'}
+_UFUNCS = {Add: 'add', Sub: 'subtract', Mul: 'multiply', Div: 'true_divide', Pow: 'power'}
+
+
+def compile_expr(expr, vars, numpy=False):
+    """
+    Compile an expression into a native Python function
+
+    The tree is walked once to generate straight-line Python source (one
+    statement per node), which is compiled into a single code object. Calling
+    the result does no per-node dispatch. Symbols that are not in vars are
+    kept symbolic, like evaluate_expr does.
+
+    Args:
+        expr: Expression to compile
+        vars: Symbol or list of Symbols, in argument order
+        numpy: Emit NumPy ufunc calls with float constants, so the function
+            works on whole arrays (free symbols are not allowed)
+
+    Returns:
+        function: f(*values) evaluating expr
+    """
+    if isinstance(vars, Symbol):
+        vars = [vars]
+    names = tuple(v.name for v in vars)
+
+    cache_key = (expr, names, numpy)
+    func = _compile_cache.get(cache_key)
+    if func is not None:
+        return func
+
+    args = {name: f"v{i}" for i, name in enumerate(names)}
+    namespace = {"np": np} if numpy else {}
+    lines = []
+
+    def constant(value):
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return bind(value)
+        if numpy:
+            # Float constants keep NumPy from rejecting int ** negative int
+            value = float(value)
+        if value != value or value in (float('inf'), float('-inf')):
+            return bind(value)
+        literal = repr(value)
+        return f"({literal})" if literal.startswith('-') else literal
+
+    def emit(node, operands):
+        if isinstance(node, Symbol):
+            if node.name in args:
+                return args[node.name]
+            if numpy:
+                raise ValueError(f"Cannot evaluate over an array: '{node}' has no value")
+            return bind(node)
+
+        if type(node) not in _OPERATORS:
+            return bind(node)
+
+        # Add and Mul are n-ary: combine their operands left to right
+        result = operands[0]
+        for operand in operands[1:]:
+            name = f"t{len(lines)}"
+            if numpy:
+                lines.append(f"    {name} = np.{_UFUNCS[type(node)]}({result}, {operand})")
+            else:
+                lines.append(f"    {name} = {result} {_OPERATORS[type(node)]} {operand}")
+            result = name
+        return result
+
+    def bind(value):
+        name = f"c{len(namespace)}"
+        namespace[name] = value
+        return name
+
+    # Shared subtrees are emitted once
+    result = fold(expr, emit, leaf=constant)
+    source = f"def compiled({', '.join(args.values())}):\n"
+    source += "\n".join(lines + [f"    return {result}"]) + "\n"
+    exec(compile(source, "<compile_expr>", "exec"), namespace)
+    func = namespace["compiled"]
+
+    if len(_compile_cache) >= _COMPILE_CACHE_SIZE:
+        _compile_cache.clear()
+    _compile_cache[cache_key] = func
+    return func
+
+
+def evaluate_array(expr, var, values):
+    """
+    Evaluate expression over a whole array of values at once
+
+    The expression is compiled to NumPy ufunc calls, so the tree is processed
+    once per array instead of once per point. Division by zero and domain
+    errors produce inf/NaN instead of raising.
+
+    Args:
+        expr: Expression to evaluate
+        var: Symbol to substitute
+        values: Array-like of values for var
+
+    Returns:
+        ndarray: Results, with the same shape as values
+    """
+    values = np.asarray(values, dtype=float)
+    func = compile_expr(expr, var, numpy=True)
+
+    with np.errstate(all='ignore'):
+        result = func(values)
+
+    # Constant expressions come back as scalars
+    return np.broadcast_to(result, values.shape).copy()
+
+
+def _linear_roots(a, b):
+    """Roots of ax + b = 0"""
+    if a != 0:
+        return [-b / a]
+    return []
+
+
+def _quadratic_roots(a, b, c):
+    """Real roots of ax^2 + bx + c = 0, with a != 0"""
+    # Quadratic formula: x = (-b ± sqrt(b^2 - 4ac)) / 2a
+    discriminant = b**2 - 4*a*c
+    if discriminant < 0:
+        return []  # No real solutions
+    elif discriminant == 0:
+        return [-b / (2*a)]
+    else:
+        sqrt_disc = discriminant ** 0.5
+        sol1 = (-b + sqrt_disc) / (2*a)
+        sol2 = (-b - sqrt_disc) / (2*a)
+        return sorted([sol1, sol2])
+
+
+def classify(eq, var):
+    """
+    Normalize an equation to f(var) = 0 and classify it, in one pass
     
-    if isinstance(expr, Div):
-        return evaluate_expr(expr.left, var, value) / evaluate_expr(expr.right, var, value)
+    Args:
+        eq: Equation object (Eq)
+        var: Symbol to solve for
     
-    if isinstance(expr, Pow):
-        return evaluate_expr(expr.base, var, value) ** evaluate_expr(expr.exp, var, value)
+    Returns:
+        tuple: (kind, numerator, denominator) where kind is one of
+            'constant', 'linear', 'quadratic', 'polynomial', 'rational' or
+            'transcendental' (anything else, other symbols included), and
+            f = numerator / denominator as Polys (both None for
+            transcendental equations)
+    """
+    rational = to_rational(Sub(eq.left, eq.right), var)
+    if rational is None:
+        return 'transcendental', None, None
     
-    return expr
+    num, den = rational
+    if den.degree > 0:
+        return 'rational', num, den
+    if num.degree == 0:
+        return 'constant', num, den
+    return POLYNOMIAL_KINDS.get(num.degree, 'polynomial'), num, den
+
+
+# Names of the low polynomial degrees, everything above is 'polynomial'
+POLYNOMIAL_KINDS = {1: 'linear', 2: 'quadratic'}
+
+
+def _rational_roots(num, den, complex_roots=False):
+    """Roots of num / den: roots of num where den does not vanish"""
+    # Common factors of (x**2 - 1) / (x - 1) give no roots, but the reduced
+    # numerator still has to be checked against the original denominator
+    reduced = cancel_common(num, den)
+    candidates = (reduced[0] if reduced else num).roots(complex_roots=complex_roots)
+    roots = []
+    for root in candidates:
+        scale = sum(abs(c) * abs(root) ** e for e, c in den.terms.items())
+        if abs(den(root)) > 1e-9 * scale:
+            roots.append(root)
+    return roots
 
 
 def solve_linear(eq, var):
     """Solve linear equation: ax + b = 0"""
-    # Move everything to left side
-    left = simplify_expr(Sub(eq.left, eq.right), var)
+    kind, num, den = classify(eq, var)
+    if kind != 'linear':
+        return []
+    return _linear_roots(num[1], num[0])
+
+
+def solve_quadratic(eq, var):
+    """Solve quadratic equation: ax^2 + bx + c = 0"""
+    kind, num, den = classify(eq, var)
+    if kind == 'linear':
+        return _linear_roots(num[1], num[0])
+    if kind != 'quadratic':
+        return []
+    return _quadratic_roots(num[2], num[1], num[0])
+
+
+def solve(eq, var, complex_roots=False, interval=None):
+    """
+    Solve equation for given variable
     
-    # Extract coefficient and constant
-    a = 0  # coefficient of var
-    b = 0  # constant term
+    The equation is classified once and sent to the matching solver.
     
-    def extract_terms(expr):
-        nonlocal a, b
-        
-        if isinstance(expr, (int, float)):
-            b += expr
-        elif isinstance(expr, Symbol):
-            if expr.name == var.name:
-                a += 1
-        elif isinstance(expr, Add):
-            extract_terms(expr.left)
-            extract_terms(expr.right)
-        elif isinstance(expr, Sub):
-            extract_terms(expr.left)
-            # Subtract right side
-            orig_a, orig_b = a, b
-            a, b = 0, 0
-            extract_terms(expr.right)
-            right_a, right_b = a, b
-            a, b = orig_a - right_a, orig_b - right_b
-        elif isinstance(expr, Mul):
-            # Check if one side is constant and other is var
-            if isinstance(expr.left, (int, float)) and isinstance(expr.right, Symbol):
-                if expr.right.name == var.name:
-                    a += expr.left
-            elif isinstance(expr.right, (int, float)) and isinstance(expr.left, Symbol):
-                if expr.left.name == var.name:
-                    a += expr.right
-            else:
-                # Try to evaluate
-                try:
-                    val = evaluate_expr(expr, var, 0)
-                    if isinstance(val, (int, float)):
-                        b += val
-                except:
-                    pass
+    Args:
+        eq: Equation object (Eq), or a list of them for a linear system
+        var: Symbol to solve for (list of Symbols, or None, for a system)
+        complex_roots: Also return non-real roots of polynomial and rational
+            equations
+        interval: Optional (x_min, x_max); only the real roots inside it are
+            returned, and equations without a symbolic solver are solved
+            numerically there
+    
+    Returns:
+        list: List of solutions, or a {symbol: value} dict for systems
+    """
+    # Systems of equations: solve([eq1, eq2], [x, y])
+    if isinstance(eq, (list, tuple)):
+        return solve_system(eq, var)
     
-    extract_terms(left)
+    kind, num, den = classify(eq, var)
     
-    # Solve ax + b = 0 => x = -b/a
-    if a != 0:
-        return [-b / a]
+    if kind == 'transcendental' and interval is not None:
+        return solve_numeric(eq, var, *interval)
+    if interval is not None:
+        complex_roots = False
+    
+    if kind == 'linear':
+        roots = _linear_roots(num[1], num[0])
+    elif kind == 'quadratic' and not complex_roots:
+        roots = _quadratic_roots(num[2], num[1], num[0])
+    elif kind in ('quadratic', 'polynomial'):
+        # Companion matrix eigenvalues, any degree
+        roots = num.roots(complex_roots=complex_roots)
+    elif kind == 'rational':
+        roots = _rational_roots(num, den, complex_roots)
     else:
-        return []
+        # Constant equations have no solution to list (or every value is
+        # one), transcendental ones need an interval to search
+        roots = []
+    
+    if interval is not None:
+        x_min, x_max = interval
+        roots = [root for root in roots if x_min <= root <= x_max]
+    return roots
 
 
-def solve_quadratic(eq, var):
-    """Solve quadratic equation: ax^2 + bx + c = 0"""
-    # Move everything to left side
-    left = simplify_expr(Sub(eq.left, eq.right), var)
+# Samples used to look for sign changes in solve_numeric
+NUMERIC_SAMPLES = 2001
+
+# Iteration cap when refining the brackets found by solve_numeric
+NUMERIC_MAX_ITERATIONS = 100
+
+
+def solve_numeric(eq, var, x_min, x_max, samples=NUMERIC_SAMPLES):
+    """
+    Find the real roots of any equation inside [x_min, x_max] numerically
+    
+    The residual is sampled over the interval in one vectorized evaluation,
+    every sign change gives a bracket, and all brackets are refined together
+    with Newton steps (using derivative()) safeguarded by bisection. Sign
+    changes across poles are discarded. Roots where the residual only
+    touches zero without changing sign are not found.
+    
+    Args:
+        eq: Equation object (Eq)
+        var: Symbol to solve for
+        x_min, x_max: Interval to search
+        samples: Number of sample points
+    
+    Returns:
+        list: Sorted roots
+    """
+    residual = Sub(eq.left, eq.right)
+    f = compile_expr(residual, var, numpy=True)
+    df = compile_expr(derivative(residual, var), var, numpy=True)
+    return _numeric_roots(f, df, x_min, x_max, samples)
+
+
+def critical_points(expr, var, x_min, x_max, samples=NUMERIC_SAMPLES):
+    """
+    Find the real critical points of any expression inside [x_min, x_max]
+    
+    Like solve_numeric on the derivative, but f' and f'' come from
+    forward-mode evaluation (evaluate_derivatives), so no derivative
+    expression is built and rules derivative() lacks, like varying
+    exponents in x * 2**(-x), are not needed.
+    
+    Args:
+        expr: Expression
+        var: Symbol of the expression
+        x_min, x_max: Interval to search
+        samples: Number of sample points
+    
+    Returns:
+        list: Sorted critical points
+    """
+    slope = lambda x_values: evaluate_derivatives(expr, var, x_values, order=2)[1]
+    bend = lambda x_values: evaluate_derivatives(expr, var, x_values, order=2)[2]
+    return _numeric_roots(slope, bend, x_min, x_max, samples)
+
+
+def _numeric_roots(f, df, x_min, x_max, samples):
+    """Sign changes of vectorized f over [x_min, x_max], refined (see solve_numeric)"""
+    xs = np.linspace(x_min, x_max, samples)
+    with np.errstate(all='ignore'):
+        ys = np.broadcast_to(f(xs), xs.shape)
+    
+    roots = xs[ys == 0]
+    finite = np.isfinite(ys)
+    change = (np.sign(ys[:-1]) * np.sign(ys[1:]) < 0) & finite[:-1] & finite[1:]
+    if change.any():
+        refined = _refine_brackets(f, df, xs[:-1][change], xs[1:][change],
+                                   ys[:-1][change], ys[1:][change])
+        roots = np.concatenate([roots, refined])
     
-    # Extract coefficients
-    a = 0  # coefficient of x^2
-    b = 0  # coefficient of x
-    c = 0  # constant
+    # Neighbouring brackets can converge to the same root
+    result = []
+    for root in np.sort(roots).tolist():
+        if not result or root - result[-1] > 1e-12 * max(1.0, abs(root)):
+            result.append(root)
+    return result
+
+
+def _refine_brackets(f, df, lo, hi, y_lo, y_hi):
+    """Safeguarded Newton on many brackets [lo, hi] at once, f(lo) * f(hi) < 0"""
+    # Orient every bracket so that f(lo) < 0 < f(hi)
+    swap = y_lo > 0
+    lo, hi = np.where(swap, hi, lo), np.where(swap, lo, hi)
+    x = (lo + hi) / 2
+    width = np.abs(hi - lo)
     
-    def extract_quadratic_terms(expr):
-        nonlocal a, b, c
+    with np.errstate(all='ignore'):
+        for _ in range(NUMERIC_MAX_ITERATIONS):
+            y = np.broadcast_to(f(x), x.shape)
+            slope = np.broadcast_to(df(x), x.shape)
+            lo = np.where(y <= 0, x, lo)
+            hi = np.where(y >= 0, x, hi)
+            
+            new_width = np.abs(hi - lo)
+            newton = x - y / slope
+            # Newton only while it stays inside the bracket and the bracket
+            # keeps halving; bisection otherwise
+            use_newton = ((newton - lo) * (newton - hi) < 0) & (new_width <= width / 2)
+            step = np.where(use_newton, newton, (lo + hi) / 2)
+            
+            converged = (y == 0) | (np.abs(step - x) <= 4e-16 * np.maximum(1.0, np.abs(x)))
+            x = np.where(converged, x, step)
+            width = new_width
+            if converged.all():
+                break
         
-        if isinstance(expr, (int, float)):
-            c += expr
-        elif isinstance(expr, Symbol):
-            if expr.name == var.name:
-                b += 1
-        elif isinstance(expr, Add):
-            extract_quadratic_terms(expr.left)
-            extract_quadratic_terms(expr.right)
-        elif isinstance(expr, Sub):
-            extract_quadratic_terms(expr.left)
-            orig_a, orig_b, orig_c = a, b, c
-            a, b, c = 0, 0, 0
-            extract_quadratic_terms(expr.right)
-            right_a, right_b, right_c = a, b, c
-            a, b, c = orig_a - right_a, orig_b - right_b, orig_c - right_c
-        elif isinstance(expr, Mul):
-            if isinstance(expr.left, (int, float)) and isinstance(expr.right, Symbol):
-                if expr.right.name == var.name:
-                    b += expr.left
-            elif isinstance(expr.right, (int, float)) and isinstance(expr.left, Symbol):
-                if expr.left.name == var.name:
-                    b += expr.right
-            elif isinstance(expr.left, (int, float)) and isinstance(expr.right, Pow):
-                if isinstance(expr.right.base, Symbol) and expr.right.base.name == var.name:
-                    if isinstance(expr.right.exp, (int, float)) and expr.right.exp == 2:
-                        a += expr.left
-            elif isinstance(expr.right, (int, float)) and isinstance(expr.left, Pow):
-                if isinstance(expr.left.base, Symbol) and expr.left.base.name == var.name:
-                    if isinstance(expr.left.exp, (int, float)) and expr.left.exp == 2:
-                        a += expr.right
-        elif isinstance(expr, Pow):
-            if isinstance(expr.base, Symbol) and expr.base.name == var.name:
-                if isinstance(expr.exp, (int, float)) and expr.exp == 2:
-                    a += 1
-    
-    extract_quadratic_terms(left)
-    
-    # Solve using quadratic formula: x = (-b ± sqrt(b^2 - 4ac)) / 2a
-    if a != 0:
-        discriminant = b**2 - 4*a*c
-        if discriminant < 0:
-            return []  # No real solutions
-        elif discriminant == 0:
-            return [-b / (2*a)]
-        else:
-            sqrt_disc = discriminant ** 0.5
-            sol1 = (-b + sqrt_disc) / (2*a)
-            sol2 = (-b - sqrt_disc) / (2*a)
-            return sorted([sol1, sol2])
-    else:
-        # Not quadratic, try linear
-        return solve_linear(eq, var)
+        # Brackets around a pole close in on it with a huge residual
+        y = np.abs(np.broadcast_to(f(x), x.shape))
+    return x[y < np.minimum(np.abs(y_lo), np.abs(y_hi))]
 
 
-def solve(eq, var):
+def solve_batch(eq, var, params, complex_roots=False):
     """
-    Solve equation for given variable
+    Solve one polynomial equation for many sets of parameter values at once
+    
+    The coefficients of var are extracted symbolically once, as expressions
+    in the parameters, and evaluated over all parameter rows with NumPy.
+    Degrees 1 and 2 use the closed forms, higher degrees the eigenvalues of
+    a stack of companion matrices.
     
     Args:
-        eq: Equation object (Eq)
+        eq: Equation object (Eq), polynomial in var
         var: Symbol to solve for
+        params: {Symbol: array-like} values of the other symbols; arrays
+            broadcast against each other
+        complex_roots: Return all roots as complex numbers instead of only
+            the real ones
     
     Returns:
-        list: List of solutions
+        ndarray: Shape (*rows, degree). Real roots are sorted and padded with
+            NaN; complex roots are sorted by real then imaginary part. Rows
+            where the leading coefficient vanishes (and the equation has a
+            lower degree) are solved as such for degree <= 2 and are NaN
+            above.
+    
+    Raises:
+        ValueError: If eq is not a polynomial in var
     """
-    # Determine equation type
-    # First try quadratic
-    solutions = solve_quadratic(eq, var)
-    if solutions:
-        return solutions
+    poly = to_poly(Sub(eq.left, eq.right), var, symbolic=True)
+    if poly is None:
+        raise ValueError(f"Equation is not a polynomial in '{var}'")
+    
+    names = list(params)
+    values = np.broadcast_arrays(*[np.asarray(params[name], dtype=float) for name in names])
+    shape = values[0].shape if values else ()
+    degree = poly.degree
+    
+    # One column per coefficient, highest degree first
+    with np.errstate(all='ignore'):
+        coeffs = np.stack([np.broadcast_to(compile_expr(c, names, numpy=True)(*values), shape)
+                           for c in poly.coeffs()], axis=-1).reshape(-1, degree + 1)
+    
+    with np.errstate(all='ignore'):
+        if degree == 0:
+            roots = np.empty((len(coeffs), 0))
+        elif degree <= 2:
+            roots = _batch_quadratic(np.zeros(len(coeffs)) if degree == 1 else coeffs[:, 0],
+                                     coeffs[:, -2], coeffs[:, -1], complex_roots)[:, :degree]
+        else:
+            roots = _batch_companion(coeffs, complex_roots)
+    return roots.reshape(shape + (degree,))
+
+
+def _batch_quadratic(a, b, c, complex_roots):
+    """Roots of a x**2 + b x + c for arrays of coefficients, shape (n, 2)"""
+    dtype = complex if complex_roots else float
+    disc = (b * b - 4 * a * c).astype(dtype)
+    sqrt_disc = np.sqrt(disc) if complex_roots else np.where(disc >= 0, np.sqrt(np.abs(disc)), np.nan)
+    # q = -(b + sign(b) sqrt(disc)) / 2 avoids cancellation; the roots are q/a and c/q
+    sqrt_disc = np.where(np.real(np.conj(b) * sqrt_disc) < 0, -sqrt_disc, sqrt_disc)
+    q = -0.5 * (b + sqrt_disc)
+    first = np.where(q != 0, c / np.where(q != 0, q, 1), 0)
+    second = q / a
+    
+    # a == 0: the single root of the linear equation, in the first column
+    linear = a == 0
+    first = np.where(linear, -c / b, first)
+    second = np.where(linear, np.nan, second)
+    return _sort_roots(np.stack([first, second], axis=-1).astype(dtype), complex_roots)
+
+
+def _batch_companion(coeffs, complex_roots):
+    """Roots of many polynomials of the same degree, shape (n, degree)"""
+    n, degree = coeffs.shape[0], coeffs.shape[1] - 1
+    lead = coeffs[:, :1]
+    valid = (lead[:, 0] != 0) & np.all(np.isfinite(coeffs), axis=1)
+    
+    companion = np.zeros((n, degree, degree))
+    companion[:, 0, :] = np.where(valid[:, None], -coeffs[:, 1:] / np.where(lead != 0, lead, 1), 0)
+    companion[:, np.arange(1, degree), np.arange(degree - 1)] = 1
+    roots = _polish(coeffs, np.linalg.eigvals(companion).astype(complex))
+    roots[~valid] = np.nan
     
-    # Try linear
-    solutions = solve_linear(eq, var)
-    return solutions
+    if not complex_roots:
+        real = np.abs(roots.imag) <= REAL_ROOT_TOL * np.maximum(1.0, np.abs(roots))
+        roots = np.where(real, roots.real, np.nan)
+    return _sort_roots(roots, complex_roots)
+
+
+def _sort_roots(roots, complex_roots):
+    """Sort each row of roots, NaN last"""
+    # Adding 0.0 turns -0.0 into 0.0
+    if complex_roots:
+        # NumPy sorts complex numbers by real part, then imaginary part
+        return np.sort(roots, axis=-1) + 0.0
+    return np.sort(roots.real, axis=-1) + 0.0
+
+
+# Systems with at least this many unknowns use a sparse solver when SciPy is
+# installed and the coefficient matrix is sparse enough
+SPARSE_SYSTEM_MIN_SIZE = 200
+SPARSE_SYSTEM_MAX_DENSITY = 0.1
+
+
+def linear_form(expr, vars):
+    """
+    Read expr as a linear combination of vars
+    
+    Args:
+        expr: Expression (or number)
+        vars: Symbols allowed to appear (a set or dict is used as is)
+    
+    Returns:
+        dict: {symbol: coefficient, None: constant term}, or None if expr is
+            not linear in vars with numeric coefficients
+    """
+    allowed = vars if isinstance(vars, (set, frozenset, dict)) else set(vars)
+    
+    def constant(form):
+        return set(form) <= {None}
+    
+    def visit(node, args):
+        if isinstance(node, Symbol):
+            return {node: 1} if node in allowed else None
+        if any(arg is None for arg in args):
+            return None
+        
+        if isinstance(node, (Add, Sub)):
+            result = dict(args[0])
+            sign = -1 if isinstance(node, Sub) else 1
+            for arg in args[1:]:
+                for key, coeff in arg.items():
+                    result[key] = result.get(key, 0) + sign * coeff
+            return result
+        
+        if isinstance(node, Mul):
+            # At most one factor may depend on the unknowns
+            scale = 1
+            linear = {None: 1}
+            for arg in args:
+                if constant(arg):
+                    scale *= arg.get(None, 0)
+                elif constant(linear):
+                    scale *= linear[None]
+                    linear = arg
+                else:
+                    return None
+            return {key: coeff * scale for key, coeff in linear.items()}
+        
+        if isinstance(node, Div):
+            num, den = args
+            if not constant(den) or den.get(None, 0) == 0:
+                return None
+            return {key: coeff / den[None] for key, coeff in num.items()}
+        
+        if isinstance(node, Pow):
+            base, exp = args
+            if not constant(exp):
+                return None
+            if constant(base):
+                return {None: base.get(None, 0) ** exp.get(None, 0)}
+            return base if exp.get(None, 0) == 1 else None
+        
+        return None
+    
+    return fold(expr, visit, leaf=lambda value: {None: value} if isinstance(value, (int, float)) else None)
+
+
+def solve_system(eqs, vars=None):
+    """
+    Solve a system of linear equations
+    
+    Square systems are solved by LU decomposition (NumPy), or by SciPy's
+    sparse solver for large sparse systems when SciPy is installed. Other
+    systems are solved by least squares and only accepted when the solution
+    is unique and satisfies every equation.
+    
+    Args:
+        eqs: List of equations (Eq)
+        vars: Symbols to solve for (default: every symbol in eqs)
+    
+    Returns:
+        dict: {symbol: value}, empty if the system is not linear or has no
+            unique solution
+    """
+    residuals = [Sub(eq.left, eq.right) for eq in eqs]
+    if vars is None:
+        vars = sorted({s for r in residuals for s in free_symbols(r)}, key=lambda s: s.name)
+    vars = list(vars)
+    index = {var: i for i, var in enumerate(vars)}
+    
+    rows, cols, values = [], [], []
+    b = np.zeros(len(residuals))
+    for row, residual in enumerate(residuals):
+        form = linear_form(residual, index)
+        if form is None:
+            return {}
+        for key, coeff in form.items():
+            if key is None:
+                b[row] = -coeff
+            elif coeff != 0:
+                rows.append(row)
+                cols.append(index[key])
+                values.append(coeff)
+    
+    shape = (len(residuals), len(vars))
+    x = None
+    if shape[0] == shape[1] and shape[0] >= SPARSE_SYSTEM_MIN_SIZE and \
+            len(values) <= SPARSE_SYSTEM_MAX_DENSITY * shape[0] * shape[1]:
+        x = _solve_sparse(rows, cols, values, shape, b)
+    
+    if x is None:
+        a = np.zeros(shape)
+        # Repeated (row, col) pairs cannot happen: each form has one entry per symbol
+        a[rows, cols] = values
+        x = _solve_dense(a, b)
+    
+    if x is None or not np.all(np.isfinite(x)):
+        return {}
+    return {var: float(value) for var, value in zip(vars, x)}
+
+
+def _solve_dense(a, b):
+    """Unique solution of a x = b, or None"""
+    if a.shape[0] == a.shape[1]:
+        try:
+            return np.linalg.solve(a, b)
+        except np.linalg.LinAlgError:
+            return None
+    
+    x, _, rank, _ = np.linalg.lstsq(a, b, rcond=None)
+    if rank < a.shape[1] or not np.allclose(a @ x, b):
+        return None
+    return x
+
+
+def _solve_sparse(rows, cols, values, shape, b):
+    """Solution of a sparse square system with SciPy, or None without SciPy"""
+    try:
+        from scipy.sparse import csc_matrix
+        from scipy.sparse.linalg import spsolve, MatrixRankWarning
+    except ImportError:
+        return None
+    
+    a = csc_matrix((values, (rows, cols)), shape=shape)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", MatrixRankWarning)
+        try:
+            return spsolve(a, b)
+        except MatrixRankWarning:
+            return np.full(shape[1], np.nan)
+
+
+# Derivatives of (expression, variable) pairs, shared across calls so repeated
+# subtrees and repeated commands reuse earlier work
+derivative_cache = LRUCache(maxsize=globals.DERIVATIVE_CACHE_SIZE)
+
+# Expanded polynomials up to this degree are differentiated as Poly
+POLY_FAST_PATH_DEGREE = 64
+
+# Products with at least this many factors depending on the variable are
+# differentiated half by half, so the derivative does not repeat every factor
+# once per factor
+SPLIT_PRODUCT_MIN_FACTORS = 8
 
 
 def derivative(expr, var):
     """
     Compute the derivative of an expression with respect to a variable
     
+    Results are memoized per subtree in derivative_cache.
+    
     Args:
         expr: Expression to differentiate
         var: Symbol to differentiate with respect to
@@ -233,39 +801,73 @@ def derivative(expr, var):
     if isinstance(expr, (int, float)):
         return 0
     
+    result = derivative_cache.get((expr, var))
+    if result is not None:
+        return result
+    
+    # Polynomial fast path: differentiate the coefficients in O(degree).
+    # Only for sums of monomials, (x - 1.1)**40 keeps the chain rule
+    poly = to_poly(expr, var, max_degree=POLY_FAST_PATH_DEGREE) if is_expanded(expr, var) else None
+    if poly is not None:
+        result = poly.deriv().to_expr(var)
+        derivative_cache.put((expr, var), result)
+        return result
+    
+    # Rational functions are reduced first: d/dx(x**2 / x) is d/dx(x)
+    reduced = cancel(expr, var, max_degree=POLY_FAST_PATH_DEGREE)
+    if reduced is not expr:
+        result = derivative(reduced, var)
+        derivative_cache.put((expr, var), result)
+        return result
+    
+    def lookup(node):
+        return derivative_cache.get((node, var))
+    
+    def visit(node, primes):
+        result = _derivative(node, primes, var)
+        derivative_cache.put((node, var), result)
+        return result
+    
+    return fold(expr, visit, leaf=lambda value: 0, lookup=lookup)
+
+
+def _derivative(expr, primes, var):
+    """Apply the differentiation rule for the top node of expr, given the
+    derivatives of its args"""
     # Variable rule: d/dx(x) = 1, d/dx(y) = 0
     if isinstance(expr, Symbol):
-        if expr.name == var.name:
+        if expr is var:
             return 1
         else:
             return 0
     
-    # Sum rule: d/dx(f + g) = f' + g'
+    # Sum rule: d/dx(f + g + ...) = f' + g' + ...
     if isinstance(expr, Add):
-        left_deriv = derivative(expr.left, var)
-        right_deriv = derivative(expr.right, var)
-        return Add(left_deriv, right_deriv)
+        return Add(*primes)
     
     # Difference rule: d/dx(f - g) = f' - g'
     if isinstance(expr, Sub):
-        left_deriv = derivative(expr.left, var)
-        right_deriv = derivative(expr.right, var)
+        left_deriv, right_deriv = primes
         return Sub(left_deriv, right_deriv)
     
-    # Product rule: d/dx(f * g) = f' * g + f * g'
+    # Product rule: d/dx(f * g * ...) = f' * g * ... + f * g' * ... + ...
     if isinstance(expr, Mul):
-        f = expr.left
-        g = expr.right
-        f_prime = derivative(f, var)
-        g_prime = derivative(g, var)
-        return Add(Mul(f_prime, g), Mul(f, g_prime))
+        args = expr.args
+        varying = [i for i, prime in enumerate(primes)
+                   if not (isinstance(prime, (int, float)) and prime == 0)]
+        
+        if len(varying) >= SPLIT_PRODUCT_MIN_FACTORS:
+            return _product_derivative(args, primes)
+        
+        terms = []
+        for i in varying:
+            terms.append(Mul(*args[:i], primes[i], *args[i + 1:]))
+        return Add(*terms)
     
     # Quotient rule: d/dx(f / g) = (f' * g - f * g') / g^2
     if isinstance(expr, Div):
-        f = expr.left
-        g = expr.right
-        f_prime = derivative(f, var)
-        g_prime = derivative(g, var)
+        f, g = expr.args
+        f_prime, g_prime = primes
         numerator = Sub(Mul(f_prime, g), Mul(f, g_prime))
         denominator = Pow(g, 2)
         return Div(numerator, denominator)
@@ -276,7 +878,7 @@ def derivative(expr, var):
         exponent = expr.exp
         
         # Special case: d/dx(x^n) where n is constant
-        if isinstance(base, Symbol) and base.name == var.name:
+        if base is var:
             if isinstance(exponent, (int, float)):
                 # n * x^(n-1)
                 new_exp = exponent - 1
@@ -292,7 +894,7 @@ def derivative(expr, var):
         # For simplicity, handle constant exponent case
         if isinstance(exponent, (int, float)):
             # Chain rule: n * f^(n-1) * f'
-            base_deriv = derivative(base, var)
+            base_deriv = primes[0]
             return Mul(Mul(exponent, Pow(base, exponent - 1)), base_deriv)
         
         # If both are variables/expressions, it's more complex
@@ -302,104 +904,293 @@ def derivative(expr, var):
     return 0
 
 
+def _product_derivative(args, primes):
+    """
+    Derivative of Mul(*args) given the derivatives of args, never dividing
+    
+    Uses (A * B)' = A' * B + A * B' on the two halves of the factors,
+    recursively: O(n) nodes holding O(n log n) operands in all, against
+    n * n operands for one term per factor, and defined wherever the
+    product is.
+    """
+    if all(isinstance(prime, (int, float)) and prime == 0 for prime in primes):
+        return 0
+    if len(args) == 1:
+        return primes[0]
+    mid = len(args) // 2
+    return Add(Mul(_product_derivative(args[:mid], primes[:mid]), *args[mid:]),
+               Mul(*args[:mid], _product_derivative(args[mid:], primes[mid:])))
+
+
 def simplify_derivative(expr):
-    """Simplify a derivative expression"""
-    if isinstance(expr, (int, float)):
-        return expr
+    """Simplify a derivative expression (see simplify)"""
+    return simplify(expr)
+
+
+# NumPy ufunc names (looked up at call time, NumPy is imported lazily)
+_NUMPY_OPS = {Add: 'add', Sub: 'subtract', Mul: 'multiply', Div: 'true_divide', Pow: 'power'}
+
+
+def gradient(expr, vars, points):
+    """
+    Numeric gradient of expr by reverse-mode automatic differentiation
     
-    if isinstance(expr, Symbol):
-        return expr
+    Args:
+        expr: Expression to differentiate
+        vars: Symbol, or list of Symbols
+        points: Values of vars, shape (..., len(vars)), or any shape when vars
+            is a single Symbol
     
-    if isinstance(expr, Add):
-        left = simplify_derivative(expr.left)
-        right = simplify_derivative(expr.right)
-        
-        # 0 + x = x
-        if isinstance(left, (int, float)) and left == 0:
-            return right
-        if isinstance(right, (int, float)) and right == 0:
-            return left
-        
-        # Combine constants
-        if isinstance(left, (int, float)) and isinstance(right, (int, float)):
-            return left + right
-        
-        return Add(left, right)
+    Returns:
+        ndarray: Gradient at every point, shape (..., len(vars)), or the
+            shape of points when vars is a single Symbol
+    """
+    result = jacobian([expr], vars, points)
+    return result[..., 0] if isinstance(vars, Symbol) else result[..., 0, :]
+
+
+def jacobian(exprs, vars, points):
+    """
+    Numeric Jacobian of several expressions by reverse-mode automatic
+    differentiation
     
-    if isinstance(expr, Sub):
-        left = simplify_derivative(expr.left)
-        right = simplify_derivative(expr.right)
-        
-        # x - 0 = x
-        if isinstance(right, (int, float)) and right == 0:
-            return left
-        # 0 - x = -x
-        if isinstance(left, (int, float)) and left == 0:
-            return Mul(-1, right)
-        
-        # Combine constants
-        if isinstance(left, (int, float)) and isinstance(right, (int, float)):
-            return left - right
-        
-        return Sub(left, right)
+    The expression DAG is evaluated once over all points (forward sweep),
+    then the adjoints of every output are propagated back together
+    (backward sweep), so the cost does not grow with the number of variables
+    and no symbolic derivative is built. Shared subtrees are visited once.
     
-    if isinstance(expr, Mul):
-        left = simplify_derivative(expr.left)
-        right = simplify_derivative(expr.right)
-        
-        # 0 * x = 0
-        if (isinstance(left, (int, float)) and left == 0) or (isinstance(right, (int, float)) and right == 0):
-            return 0
-        # 1 * x = x
-        if isinstance(left, (int, float)) and left == 1:
-            return right
-        if isinstance(right, (int, float)) and right == 1:
-            return left
-        
-        # Combine constants
-        if isinstance(left, (int, float)) and isinstance(right, (int, float)):
-            return left * right
-        
-        return Mul(left, right)
+    Args:
+        exprs: List of expressions
+        vars: Symbol, or list of Symbols
+        points: Values of vars, shape (..., len(vars)), or any shape when vars
+            is a single Symbol
     
-    if isinstance(expr, Div):
-        left = simplify_derivative(expr.left)
-        right = simplify_derivative(expr.right)
-        
-        # 0 / x = 0
-        if isinstance(left, (int, float)) and left == 0:
-            return 0
-        # x / 1 = x
-        if isinstance(right, (int, float)) and right == 1:
-            return left
-        
-        # Combine constants
-        if isinstance(left, (int, float)) and isinstance(right, (int, float)):
-            return left / right
-        
-        return Div(left, right)
+    Returns:
+        ndarray: Shape (..., len(exprs), len(vars)), or (..., len(exprs))
+            when vars is a single Symbol
     
-    if isinstance(expr, Pow):
-        base = simplify_derivative(expr.base)
-        exp = simplify_derivative(expr.exp)
+    Raises:
+        ValueError: If an expression has a symbol that is not in vars
+    """
+    single = isinstance(vars, Symbol)
+    vars = [vars] if single else list(vars)
+    points = np.asarray(points, dtype=float)
+    if single:
+        points = points[..., None]
+    if points.shape[-1] != len(vars):
+        raise ValueError(f"Points have {points.shape[-1]} coordinates, expected {len(vars)}")
+    batch = points.shape[:-1]
+    index = {var: i for i, var in enumerate(vars)}
+    
+    # Forward sweep: the value of every distinct node, children first
+    values = {}
+    order = []
+    
+    def visit(node, args):
+        if isinstance(node, Symbol):
+            if node not in index:
+                raise ValueError(f"Cannot differentiate: '{node}' has no value")
+            value = points[..., index[node]]
+        else:
+            op = getattr(np, _NUMPY_OPS[type(node)])
+            value = args[0]
+            for arg in args[1:]:
+                value = op(value, arg)
+        values[id(node)] = value
+        order.append(node)
+        return value
+    
+    with np.errstate(all='ignore'):
+        for expr in exprs:
+            # NumPy scalars for constants too, so errstate covers x / 0
+            fold(expr, visit, leaf=np.float64, lookup=lambda node: values.get(id(node)))
         
-        # x^0 = 1
-        if isinstance(exp, (int, float)) and exp == 0:
-            return 1
-        # x^1 = x
-        if isinstance(exp, (int, float)) and exp == 1:
-            return base
-        # 0^n = 0 (for n > 0)
-        if isinstance(base, (int, float)) and base == 0:
-            return 0
-        # 1^n = 1
-        if isinstance(base, (int, float)) and base == 1:
-            return 1
+        # Backward sweep: adjoints carry one row per output
+        adjoints = {}
+        for i, expr in enumerate(exprs):
+            if isinstance(expr, Expr):
+                seed = np.zeros((len(exprs),) + batch)
+                seed[i] = 1
+                adjoints[id(expr)] = adjoints.get(id(expr), 0) + seed
         
-        # Combine constants
-        if isinstance(base, (int, float)) and isinstance(exp, (int, float)):
-            return base ** exp
+        result = np.zeros((len(vars), len(exprs)) + batch)
+        for node in reversed(order):
+            adjoint = adjoints.pop(id(node), None)
+            if adjoint is None:
+                continue
+            if isinstance(node, Symbol):
+                result[index[node]] += adjoint
+                continue
+            args = [values[id(arg)] if isinstance(arg, Expr) else np.float64(arg) for arg in node.args]
+            for arg, partial in zip(node.args, _partials(node, args)):
+                if isinstance(arg, Expr):
+                    # Outputs that do not depend on node get nothing, even
+                    # through an infinite partial (0 * inf would be NaN)
+                    contribution = np.where(adjoint == 0, 0.0, adjoint * partial)
+                    adjoints[id(arg)] = adjoints.get(id(arg), 0) + contribution
+    
+    # (vars, exprs, *batch) -> (*batch, exprs, vars)
+    result = np.moveaxis(result, (0, 1), (-1, -2))
+    return result[..., 0] if single else result
+
+
+def _partials(node, args):
+    """Partial derivatives of node with respect to each of its args, given their values"""
+    if isinstance(node, Add):
+        return [1.0] * len(args)
+    if isinstance(node, Sub):
+        return [1.0, -1.0]
+    if isinstance(node, Mul):
+        # Product of the other factors, from prefix and suffix products
+        # (linear in the number of factors, and exact when a factor is 0)
+        prefix = [1.0]
+        for value in args[:-1]:
+            prefix.append(prefix[-1] * value)
+        partials = [None] * len(args)
+        suffix = 1.0
+        for i in range(len(args) - 1, -1, -1):
+            partials[i] = prefix[i] * suffix
+            suffix = suffix * args[i]
+        return partials
+    if isinstance(node, Div):
+        left, right = args
+        return [np.divide(1.0, right), np.divide(-left, right * right)]
+    if isinstance(node, Pow):
+        base, exp = args
+        partials = [exp * np.power(base, exp - 1.0)]
+        # d/dg(f^g) = f^g * ln(f), only needed when the exponent varies
+        partials.append(np.power(base, exp) * np.log(base) if isinstance(node.exp, Expr) else 0.0)
+        return partials
+    raise ValueError(f"Cannot differentiate node type {type(node).__name__}")
+
+
+def evaluate_derivatives(expr, var, values, order=1):
+    """
+    Evaluate expression and its derivatives over an array in one pass
+    
+    Forward-mode differentiation with truncated Taylor arithmetic: every
+    node carries the Taylor coefficients of its value up to the given order,
+    so no derivative expression is built. order=1 is dual-number
+    evaluation.
+    
+    Args:
+        expr: Expression to evaluate
+        var: Symbol to substitute
+        values: Array-like of values for var
+        order: Highest derivative to compute
+    
+    Returns:
+        ndarray: Shape (order + 1, *values.shape), row k holding the k-th
+            derivative (row 0 is the value itself)
+    """
+    values = np.asarray(values, dtype=float)
+    
+    def visit(node, args):
+        if isinstance(node, Symbol):
+            if node is not var:
+                raise ValueError(f"Cannot evaluate over an array: '{node}' has no value")
+            series = np.zeros((order + 1,) + values.shape)
+            series[0] = values
+            if order:
+                series[1] = 1
+            return series
         
-        return Pow(base, exp)
+        result = args[0]
+        for arg in args[1:]:
+            if isinstance(node, Add):
+                result = result + arg
+            elif isinstance(node, Sub):
+                result = result - arg
+            elif isinstance(node, Mul):
+                result = _series_mul(result, arg)
+            elif isinstance(node, Div):
+                result = _series_div(result, arg)
+            else:
+                result = _series_pow(result, arg, node.exp)
+        return result
+    
+    def leaf(value):
+        series = np.zeros((order + 1,) + values.shape)
+        series[0] = value
+        return series
+    
+    with np.errstate(all='ignore'):
+        series = fold(expr, visit, leaf=leaf)
+    
+    # Taylor coefficient k times k! is the k-th derivative
+    factorials = np.cumprod([1.0] + list(range(1, order + 1)))
+    return series * factorials.reshape((-1,) + (1,) * values.ndim)
+
+
+def _series_mul(a, b):
+    """Product of two truncated Taylor series (Cauchy product)"""
+    result = np.zeros_like(a)
+    for k in range(len(a)):
+        for j in range(k + 1):
+            result[k] += a[j] * b[k - j]
+    return result
+
+
+def _series_div(a, b):
+    """Quotient of two truncated Taylor series"""
+    result = np.zeros_like(a)
+    for k in range(len(a)):
+        total = a[k].copy()
+        for j in range(1, k + 1):
+            total -= b[j] * result[k - j]
+        result[k] = total / b[0]
+    return result
+
+
+def _series_exp(u):
+    """exp of a truncated Taylor series"""
+    result = np.zeros_like(u)
+    result[0] = np.exp(u[0])
+    for k in range(1, len(u)):
+        for j in range(1, k + 1):
+            result[k] += j * u[j] * result[k - j]
+        result[k] /= k
+    return result
+
+
+def _series_log(a):
+    """Natural log of a truncated Taylor series"""
+    result = np.zeros_like(a)
+    result[0] = np.log(a[0])
+    for k in range(1, len(a)):
+        total = a[k].copy()
+        for j in range(1, k):
+            total -= j * result[j] * a[k - j] / k
+        result[k] = total / a[0]
+    return result
+
+
+def _series_pow(base, exp, exp_node):
+    """base ** exp for truncated Taylor series"""
+    if isinstance(exp_node, Expr):
+        # Varying exponent: exp(g * ln(f))
+        return _series_exp(_series_mul(exp, _series_log(base)))
+    
+    if float(exp_node).is_integer() and exp_node >= 0:
+        # Repeated squaring stays exact where the base is 0
+        result = np.zeros_like(base)
+        result[0] = 1
+        power = base
+        n = int(exp_node)
+        while n:
+            if n & 1:
+                result = _series_mul(result, power)
+            n >>= 1
+            if n:
+                power = _series_mul(power, power)
+        return result
     
-    return expr
\ No newline at end of file
+    # Constant real exponent r: c_k = sum_j ((r + 1) j - k) a_j c_(k-j) / (k a_0)
+    r = float(exp_node)
+    result = np.zeros_like(base)
+    result[0] = np.power(base[0], r)
+    for k in range(1, len(base)):
+        for j in range(1, k + 1):
+            result[k] += ((r + 1) * j - k) * base[j] * result[k - j]
+        result[k] /= k * base[0]
+    return result
@@ -1,259 +1,554 @@
 """
 Custom symbolic math system
 Supports basic symbolic operations and expressions
+
+Expression nodes are immutable and hash-consed: building the same structure
+twice returns the same object, so identical subtrees are shared and structural
+equality is an identity check (a is b).
+
+Add and Mul are n-ary and canonical: nested sums and products are flattened,
+like terms are collected (x + x -> 2*x, x * x**2 -> x**3), differences are
+sums of negated terms (x - y -> x + (-1)*y) and operands are kept in a fixed
+order, so polynomials stay shallow however many terms they have.
+
+The == operator builds an Eq for writing equations. Structural comparison
+uses expr.equals(other), and expr.key() / hash(expr) let nodes be used as
+dict keys and in caches.
 """
 
-class Symbol:
-    """Represents a symbolic variable"""
-    def __init__(self, name):
-        self.name = name
-    
+import itertools
+import weakref
+import zlib
+from bisect import bisect_left, insort
+
+
+# Intern table: structural identity of a node -> the live node
+_table = weakref.WeakValueDictionary()
+
+# Creation serial of each node, the last tie-breaker of its sort keys
+_serials = itertools.count()
+
+
+def _ident(value):
+    """Identity of a node field inside the intern table"""
+    if isinstance(value, Expr):
+        # Children are interned, so their id is their structure
+        return id(value)
+    try:
+        hash(value)
+    except TypeError:
+        return id(value)
+    # Keep 2 and 2.0 apart, they print differently
+    return (type(value), value)
+
+
+def _hash_of(value):
+    """Structural hash of a node field"""
+    if isinstance(value, Expr):
+        return value._hash
+    try:
+        return hash(value)
+    except TypeError:
+        return id(value)
+
+
+def key_of(value):
+    """Structural key of an expression or a number"""
+    if isinstance(value, Expr):
+        return value.key()
+    return (0, value, type(value).__name__)
+
+
+def _sort_of(node):
+    return node._sort
+
+
+def _intern(cls, ident, hash_value, **fields):
+    """Return the interned node for ident, creating it if needed"""
+    node = _table.get(ident)
+    if node is None:
+        node = object.__new__(cls)
+        for name, value in fields.items():
+            object.__setattr__(node, name, value)
+        object.__setattr__(node, '_hash', hash_value)
+        # Flat sort keys, computed once: sorting never walks into the children
+        object.__setattr__(node, '_sort', (cls._rank, node._sort_name(), hash_value, next(_serials)))
+        object.__setattr__(node, '_order', node._term_order())
+        _table[ident] = node
+    return node
+
+
+class Expr:
+    """Base class for expressions"""
+    __slots__ = ('args', '_hash', '_sort', '_order', '__weakref__')
+
+    # Position of the node type in the sort key ordering (numbers are 0)
+    _rank = 7
+
+    def __new__(cls, *args):
+        ident = [cls]
+        # Ranks rather than class names, so hashes (and orderings) are the
+        # same in every process
+        hashes = [cls._rank]
+        for arg in args:
+            if isinstance(arg, Expr):
+                ident.append(id(arg))
+                hashes.append(arg._hash)
+            else:
+                ident.append(_ident(arg))
+                hashes.append(_hash_of(arg))
+        return _intern(cls, tuple(ident), hash(tuple(hashes)), args=args)
+
+    def key(self):
+        """
+        Structural key of the expression
+
+        One entry per distinct subexpression, children first: (rank, name)
+        for symbols and (rank, *operands) for the others, where an operand
+        is ('', position of its entry) for a child node and (type, value)
+        for a number. Keys are equal exactly when the expressions are
+        structurally equal, also after they are rebuilt, and are built in
+        O(nodes) without recursion however deep the expression is.
+        """
+        nodes = postorder(self)
+        position = {id(node): i for i, node in enumerate(nodes)}
+        return tuple(
+            (node._rank, node.name) if isinstance(node, Symbol) else
+            (node._rank,) + tuple(('', position[id(arg)]) if isinstance(arg, Expr)
+                                  else (type(arg).__name__, arg) for arg in node.args)
+            for node in nodes)
+
+    def _sort_name(self):
+        """Symbol names in the node, so x sorts before y"""
+        return ''
+
+    def equals(self, other):
+        """Structural equality (O(1), since nodes are interned)"""
+        return self is other
+
+    def _term_order(self):
+        """
+        Ordering key of the node as a term of a sum, ignoring its coefficient
+
+        Flat tuple (degree, rank, name, hash, serial): higher degree first
+        (counting numeric powers), then the sort key.
+        """
+        return (-1,) + self._sort
+
+    def __hash__(self):
+        return self._hash
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Expressions are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Expressions are immutable")
+
+    def __reduce__(self):
+        # Rebuild through the constructor so copies and unpickled nodes are interned
+        return (type(self), self.args)
+
     def __repr__(self):
-        return self.name
-    
-    def __str__(self):
-        return self.name
-    
+        # Expand tokens with an explicit stack, so deep trees print in linear time
+        out = []
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, Expr):
+                stack.extend(reversed(item._tokens()))
+            else:
+                out.append(str(item))
+        return "".join(out)
+
+    def _tokens(self):
+        """Printed form as a list of strings and child nodes"""
+        return [type(self).__name__, *_infix(self.args, ", ")]
+
     def __add__(self, other):
         return Add(self, other)
-    
+
     def __sub__(self, other):
         return Sub(self, other)
-    
+
     def __mul__(self, other):
         return Mul(self, other)
-    
+
     def __truediv__(self, other):
         return Div(self, other)
-    
+
     def __pow__(self, other):
         return Pow(self, other)
-    
+
     def __radd__(self, other):
         return Add(other, self)
-    
+
     def __rsub__(self, other):
         return Sub(other, self)
-    
+
     def __rmul__(self, other):
         return Mul(other, self)
-    
+
     def __rtruediv__(self, other):
         return Div(other, self)
-    
+
     def __rpow__(self, other):
         return Pow(other, self)
-    
+
     def __neg__(self):
         return Mul(-1, self)
-    
+
     def __eq__(self, other):
         return Eq(self, other)
 
 
-class Expr:
-    """Base class for expressions"""
-    pass
+class Symbol(Expr):
+    """Represents a symbolic variable"""
+    __slots__ = ('name',)
+    _rank = 1
 
+    def __new__(cls, name):
+        return _intern(cls, (cls, name), hash((cls._rank, zlib.crc32(name.encode()))), name=name, args=())
+
+    def _sort_name(self):
+        return self.name
+
+    def __reduce__(self):
+        return (type(self), (self.name,))
 
-class Add(Expr):
-    """Addition expression"""
-    def __init__(self, left, right):
-        self.left = left
-        self.right = right
-    
     def __repr__(self):
-        return f"({self.left} + {self.right})"
-    
-    def __add__(self, other):
-        return Add(self, other)
-    
-    def __sub__(self, other):
-        return Sub(self, other)
-    
-    def __mul__(self, other):
-        return Mul(self, other)
-    
-    def __truediv__(self, other):
-        return Div(self, other)
-    
-    def __pow__(self, other):
-        return Pow(self, other)
-    
-    def __radd__(self, other):
-        return Add(other, self)
-    
-    def __rsub__(self, other):
-        return Sub(other, self)
-    
-    def __rmul__(self, other):
-        return Mul(other, self)
-    
-    def __rtruediv__(self, other):
-        return Div(other, self)
-    
-    def __eq__(self, other):
-        return Eq(self, other)
+        return self.name
+
+    def __str__(self):
+        return self.name
+
+    def _tokens(self):
+        return [self.name]
+
+
+def _infix(args, op):
+    """Tokens for args joined by op, in parentheses"""
+    tokens = ["("]
+    for arg in args:
+        tokens.append(arg)
+        tokens.append(op)
+    tokens[-1] = ")"
+    return tokens
+
+
+def _flatten(cls, args):
+    """Splice the operands of nested cls nodes into args"""
+    for arg in args:
+        if type(arg) is cls:
+            yield from arg.args
+        else:
+            yield arg
+
+
+def _order_of(term):
+    return term._order
+
+
+def _like_order_of(term):
+    # Term order without the serial: equal for like terms
+    return term._order[:4]
+
+
+def _split_term(term):
+    """(coefficient, non-numeric factors) of a term"""
+    if type(term) is not Mul:
+        return 1, (term,)
+    if isinstance(term.args[0], Expr):
+        return 1, term.args
+    return term.args[0], term.args[1:]
+
+
+def _add_term(add, term):
+    """
+    Add(add, term) for a canonical sum and one non-sum term
+
+    Finds the like term by bisection and inserts in place, so building a sum
+    one term at a time does not re-sort (or re-collect) it every step.
+    """
+    terms = list(add.args)
+    constant = 0 if isinstance(terms[-1], Expr) else terms.pop()
+    if not isinstance(term, Expr):
+        constant += term
+    else:
+        coeff, factors = _split_term(term)
+        like = term._order[:4]
+        index = bisect_left(terms, like, key=_like_order_of)
+        while index < len(terms) and terms[index]._order[:4] == like:
+            other_coeff, other_factors = _split_term(terms[index])
+            if len(other_factors) == len(factors) and \
+                    all(a is b for a, b in zip(other_factors, factors)):
+                del terms[index]
+                coeff += other_coeff
+                term = Mul(coeff, *factors) if coeff != 0 else None
+                break
+            index += 1
+        if term is not None:
+            insort(terms, term, key=_order_of)
+
+    if constant != 0 or not terms:
+        terms.append(constant)
+    if len(terms) == 1:
+        return terms[0]
+    return Expr.__new__(Add, *terms)
+
+
+class _NaryExpr(Expr):
+    """Base class for flattened, commutative expressions"""
+    __slots__ = ()
+
+    # Binary view for code that walks left/right: the last operand is the
+    # right side, everything before it is the left side
+    @property
+    def left(self):
+        if len(self.args) == 2:
+            return self.args[0]
+        return type(self)(*self.args[:-1])
+
+    @property
+    def right(self):
+        return self.args[-1]
+
+
+class Add(_NaryExpr):
+    """
+    Addition expression
+
+    Add(*terms) flattens nested sums, sums the numeric terms and collects
+    like terms by adding their coefficients. Terms are ordered by descending
+    degree, then sort key, with the constant last, e.g.
+    x**3 + 2*x**2 + x + 1.
+    """
+    __slots__ = ()
+    _rank = 4
+
+    def __new__(cls, *args):
+        if len(args) == 2:
+            first, second = args
+            if type(second) is cls and type(first) is not cls:
+                first, second = second, first
+            if type(first) is cls and type(second) is not cls:
+                return _add_term(first, second)
+
+        constant = 0
+        # Identity of the non-numeric factors -> [coefficient, factors, term]
+        like_terms = {}
+        for arg in _flatten(cls, args):
+            if not isinstance(arg, Expr):
+                constant += arg
+                continue
+            coeff, factors = _split_term(arg)
+            ident = tuple(map(id, factors))
+            entry = like_terms.get(ident)
+            if entry is None:
+                like_terms[ident] = [coeff, factors, arg]
+            else:
+                entry[0] += coeff
+                entry[2] = None
+
+        terms = []
+        for coeff, factors, term in like_terms.values():
+            if coeff == 0:
+                continue
+            if term is None:
+                term = Mul(coeff, *factors)
+            terms.append(term)
+        terms.sort(key=_order_of)
+
+        if constant != 0 or not terms:
+            terms.append(constant)
+        if len(terms) == 1:
+            return terms[0]
+        return Expr.__new__(cls, *terms)
+
+    def _tokens(self):
+        # Negative terms after the first print as differences: x - 1, not x + -1
+        tokens = ["(", self.args[0]]
+        for term in self.args[1:]:
+            coeff, factors = _split_term(term) if isinstance(term, Expr) else (term, ())
+            if _is_number(coeff) and coeff < 0:
+                tokens += [" - ", Mul(-coeff, *factors)]
+            else:
+                tokens += [" + ", term]
+        tokens.append(")")
+        return tokens
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
 
 
 class Sub(Expr):
-    """Subtraction expression"""
-    def __init__(self, left, right):
-        self.left = left
-        self.right = right
-    
-    def __repr__(self):
-        return f"({self.left} - {self.right})"
-    
-    def __add__(self, other):
-        return Add(self, other)
-    
-    def __sub__(self, other):
-        return Sub(self, other)
-    
-    def __mul__(self, other):
-        return Mul(self, other)
-    
-    def __truediv__(self, other):
-        return Div(self, other)
-    
-    def __pow__(self, other):
-        return Pow(self, other)
-    
-    def __radd__(self, other):
-        return Add(other, self)
-    
-    def __rsub__(self, other):
-        return Sub(other, self)
-    
-    def __rmul__(self, other):
-        return Mul(other, self)
-    
-    def __rtruediv__(self, other):
-        return Div(other, self)
-    
-    def __eq__(self, other):
-        return Eq(self, other)
+    """
+    Subtraction
 
+    Sub(a, b) is not a node of its own: it builds the canonical sum
+    a + (-1)*b (negating every term when b is a sum), so differences are
+    flattened and their like terms collected like any other sum. It folds
+    numbers and gives x - 0 -> x, 0 - x -> -1*x and x - x -> 0.
+    """
+    __slots__ = ()
+    _rank = 5
 
-class Mul(Expr):
-    """Multiplication expression"""
-    def __init__(self, left, right):
-        self.left = left
-        self.right = right
-    
-    def __repr__(self):
-        return f"({self.left} * {self.right})"
-    
-    def __add__(self, other):
-        return Add(self, other)
-    
-    def __sub__(self, other):
-        return Sub(self, other)
-    
-    def __mul__(self, other):
-        return Mul(self, other)
-    
-    def __truediv__(self, other):
-        return Div(self, other)
-    
-    def __pow__(self, other):
-        return Pow(self, other)
-    
-    def __radd__(self, other):
-        return Add(other, self)
-    
-    def __rsub__(self, other):
-        return Sub(other, self)
-    
-    def __rmul__(self, other):
-        return Mul(other, self)
-    
-    def __rtruediv__(self, other):
-        return Div(other, self)
-    
-    def __eq__(self, other):
-        return Eq(self, other)
+    def __new__(cls, left, right):
+        if _is_number(left) and _is_number(right):
+            return left - right
+        # The negated terms of a sum, so (x - 1) - (x - 2) collects to 1
+        terms = right.args if type(right) is Add else (right,)
+        return Add(left, *[Mul(-1, term) for term in terms])
+
+
+class Mul(_NaryExpr):
+    """
+    Multiplication expression
+
+    Mul(*factors) flattens nested products, multiplies the numeric factors
+    into one leading coefficient and merges powers of the same base by adding
+    exponents. The other factors are ordered by sort key. A zero
+    coefficient gives 0.
+    """
+    __slots__ = ()
+    _rank = 3
+
+    def __new__(cls, *args):
+        coeff = 1
+        # Identity of the base -> [base, exponent, factor]
+        powers = {}
+        for arg in _flatten(cls, args):
+            if not isinstance(arg, Expr):
+                coeff *= arg
+                continue
+            base, exp = (arg.base, arg.exp) if isinstance(arg, Pow) else (arg, 1)
+            entry = powers.get(id(base))
+            if entry is None:
+                powers[id(base)] = [base, exp, arg]
+            else:
+                entry[1] = entry[1] + exp
+                entry[2] = None
+
+        if coeff == 0:
+            return coeff
+
+        factors = []
+        for base, exp, factor in powers.values():
+            if factor is None:
+                if exp == 0:
+                    continue
+                factor = base if exp == 1 else Pow(base, exp)
+            factors.append(factor)
+        factors.sort(key=_sort_of)
+
+        if coeff != 1 or not factors:
+            factors.insert(0, coeff)
+        if len(factors) == 1:
+            return factors[0]
+        return Expr.__new__(cls, *factors)
+
+    def _factors(self):
+        return self.args[1:] if not isinstance(self.args[0], Expr) else self.args
+
+    def _sort_name(self):
+        return ''.join(f._sort[1] for f in self._factors())
+
+    def _term_order(self):
+        # Built from the factors alone, so like terms share all but the serial
+        factors = self._factors()
+        if len(factors) == 1:
+            return factors[0]._order[:4] + self._sort[3:]
+        degree = sum(f._order[0] for f in factors)
+        return (degree, self._rank, self._sort[1],
+                hash(tuple(f._hash for f in factors))) + self._sort[3:]
+
+    def _tokens(self):
+        return _infix(self.args, " * ")
 
 
 class Div(Expr):
-    """Division expression"""
-    def __init__(self, left, right):
-        self.left = left
-        self.right = right
-    
-    def __repr__(self):
-        return f"({self.left} / {self.right})"
-    
-    def __add__(self, other):
-        return Add(self, other)
-    
-    def __sub__(self, other):
-        return Sub(self, other)
-    
-    def __mul__(self, other):
-        return Mul(self, other)
-    
-    def __truediv__(self, other):
-        return Div(self, other)
-    
-    def __pow__(self, other):
-        return Pow(self, other)
-    
-    def __radd__(self, other):
-        return Add(other, self)
-    
-    def __rsub__(self, other):
-        return Sub(other, self)
-    
-    def __rmul__(self, other):
-        return Mul(other, self)
-    
-    def __rtruediv__(self, other):
-        return Div(other, self)
-    
-    def __eq__(self, other):
-        return Eq(self, other)
+    """
+    Division expression
+
+    Div(a, b) folds numbers (except division by zero) and applies x / 1 -> x,
+    0 / x -> 0 and x / x -> 1.
+    """
+    __slots__ = ()
+    _rank = 6
+
+    def __new__(cls, left, right):
+        if _is_number(right):
+            if right == 1:
+                return left
+            if _is_number(left) and right != 0:
+                return left / right
+        if _is_number(left) and left == 0 and not _is_number(right):
+            return left
+        # Only for expressions: 0 / 0 stays a node, like any division by zero
+        if isinstance(left, Expr) and left is right:
+            return 1
+        return Expr.__new__(cls, left, right)
+
+    left = property(lambda self: self.args[0])
+    right = property(lambda self: self.args[1])
+
+    def _tokens(self):
+        return _infix(self.args, " / ")
+
+
+# Integer powers with more result bits than this are left unevaluated
+MAX_FOLDED_POWER_BITS = 4096
 
 
 class Pow(Expr):
-    """Power expression"""
-    def __init__(self, base, exp):
-        self.base = base
-        self.exp = exp
-    
-    def __repr__(self):
-        return f"({self.base}**{self.exp})"
-    
-    def __add__(self, other):
-        return Add(self, other)
-    
-    def __sub__(self, other):
-        return Sub(self, other)
-    
-    def __mul__(self, other):
-        return Mul(self, other)
-    
-    def __truediv__(self, other):
-        return Div(self, other)
-    
-    def __pow__(self, other):
-        return Pow(self, other)
-    
-    def __radd__(self, other):
-        return Add(other, self)
-    
-    def __rsub__(self, other):
-        return Sub(other, self)
-    
-    def __rmul__(self, other):
-        return Mul(other, self)
-    
-    def __rtruediv__(self, other):
-        return Div(other, self)
-    
-    def __eq__(self, other):
-        return Eq(self, other)
+    """
+    Power expression
+
+    Pow(a, b) folds numbers when the result is a real number of reasonable
+    size and applies x**1 -> x, x**0 -> 1 and 1**x -> 1.
+    """
+    __slots__ = ()
+    _rank = 2
+
+    def __new__(cls, base, exp):
+        if _is_number(exp):
+            if exp == 1:
+                return base
+            if exp == 0:
+                return 1
+            if _is_number(base):
+                folded = _fold_power(base, exp)
+                if folded is not None:
+                    return folded
+        if _is_number(base) and base == 1:
+            return base
+        return Expr.__new__(cls, base, exp)
+
+    base = property(lambda self: self.args[0])
+    exp = property(lambda self: self.args[1])
+
+    def _sort_name(self):
+        return self.base._sort[1] if isinstance(self.base, Expr) else ''
+
+    def _term_order(self):
+        if isinstance(self.exp, (int, float)):
+            return (-self.exp,) + self._sort
+        return (-1,) + self._sort
+
+    def _tokens(self):
+        return _infix(self.args, "**")
+
+
+def _fold_power(base, exp):
+    """base ** exp for numbers, or None if it is not a reasonable real number"""
+    if isinstance(base, int) and isinstance(exp, int) and \
+            abs(exp) * base.bit_length() > MAX_FOLDED_POWER_BITS:
+        return None
+    try:
+        result = base ** exp
+    except (ZeroDivisionError, OverflowError):
+        return None
+    return result if _is_number(result) else None
 
 
 class Eq:
@@ -261,11 +556,157 @@ class Eq:
     def __init__(self, left, right):
         self.left = left
         self.right = right
-    
+
+    def __bool__(self):
+        # Truth value is structural equality, so dict and cache lookups that
+        # compare keys with == keep working
+        if isinstance(self.left, Expr):
+            return self.left.equals(self.right)
+        if isinstance(self.right, Expr):
+            return self.right.equals(self.left)
+        return self.left == self.right
+
     def __repr__(self):
         return f"{self.left} = {self.right}"
 
 
+def fold(expr, visit, leaf=None, lookup=None):
+    """
+    Combine an expression bottom-up without recursion
+
+    Nodes are visited in post-order with an explicit stack, once per distinct
+    node (shared subtrees are computed once), so depth is not limited by the
+    recursion limit.
+
+    Args:
+        expr: Expression (or number) to fold
+        visit: visit(node, results) -> result, results holding one entry per
+            node.args
+        leaf: Maps non-node args (numbers) to results (default: unchanged)
+        lookup: lookup(node) -> result or None, for results known in advance;
+            subtrees with a known result are not walked
+
+    Returns:
+        The result for expr
+    """
+    if not isinstance(expr, Expr):
+        return leaf(expr) if leaf else expr
+
+    memo = {}
+    stack = [expr]
+    while stack:
+        node = stack[-1]
+        if id(node) in memo:
+            stack.pop()
+            continue
+
+        if lookup is not None:
+            known = lookup(node)
+            if known is not None:
+                memo[id(node)] = known
+                stack.pop()
+                continue
+
+        pending = False
+        for arg in node.args:
+            if isinstance(arg, Expr) and id(arg) not in memo:
+                stack.append(arg)
+                pending = True
+        if pending:
+            continue
+
+        stack.pop()
+        results = []
+        for arg in node.args:
+            if isinstance(arg, Expr):
+                results.append(memo[id(arg)])
+            else:
+                results.append(leaf(arg) if leaf else arg)
+        memo[id(node)] = visit(node, results)
+
+    return memo[id(expr)]
+
+
+def postorder(expr):
+    """Distinct nodes of expr, children before parents"""
+    nodes = []
+    fold(expr, lambda node, results: nodes.append(node) or True)
+    return nodes
+
+
+def cse(expr, prefix='t'):
+    """
+    Common subexpression elimination
+
+    Every compound node used more than once in expr is given a named
+    temporary. (Equal subtrees are already the same node, so this only has
+    to count uses in the DAG.)
+
+    Args:
+        expr: Expression to rewrite
+        prefix: Name prefix of the temporaries (names taken by symbols of
+            expr are skipped)
+
+    Returns:
+        tuple: (replacements, reduced) where replacements is a list of
+            (Symbol, expression) pairs, each written in terms of earlier
+            temporaries, and reduced is expr written in terms of all of them
+    """
+    if not isinstance(expr, Expr):
+        return [], expr
+
+    uses = {}
+    for node in postorder(expr):
+        for arg in node.args:
+            if isinstance(arg, Expr):
+                uses[id(arg)] = uses.get(id(arg), 0) + 1
+
+    taken = {symbol.name for symbol in free_symbols(expr)}
+    replacements = []
+
+    def visit(node, args):
+        if isinstance(node, Symbol):
+            return node
+        rebuilt = type(node)(*args)
+        if uses.get(id(node), 0) < 2:
+            return rebuilt
+        name = f"{prefix}{len(replacements)}"
+        while name in taken:
+            name += "_"
+        temporary = Symbol(name)
+        replacements.append((temporary, rebuilt))
+        return temporary
+
+    return replacements, fold(expr, visit)
+
+
+def let_form(expr, prefix='t'):
+    """
+    Printed form of expr with shared subexpressions bound once
+
+    x*(x + 1)**2 + (x + 1)**2 prints as:
+
+    let
+        t0 = ((x + 1)**2)
+    in ((t0 * x) + t0)
+    """
+    replacements, reduced = cse(expr, prefix)
+    if not replacements:
+        return str(reduced)
+    lines = ["let"]
+    lines.extend(f"    {temporary} = {value}" for temporary, value in replacements)
+    lines.append(f"in {reduced}")
+    return "\n".join(lines)
+
+
+def free_symbols(expr):
+    """Symbols appearing in expr, sorted by name"""
+    if not isinstance(expr, Expr):
+        return []
+    found = [node for node in postorder(expr) if isinstance(node, Symbol)]
+    return sorted(found, key=lambda symbol: symbol.name)
+
+
 def symbols(names):
     """Create symbolic variables"""
     if isinstance(names, str):
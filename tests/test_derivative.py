@@ -2,8 +2,8 @@
 Test script for the derivative function
 """
 
-from symbolic_math import symbols
-from solver import derivative, simplify_derivative
+from symbolic_math import symbols, Add, Sub, Mul, Div, Pow, postorder
+from solver import derivative, simplify_derivative, simplify, gradient, evaluate_derivatives, evaluate_expr
 
 # Create symbol
 x = symbols('x')
@@ -71,3 +71,56 @@ expr8 = (x + 1)**2
 deriv8 = derivative(expr8, x)
 simplified8 = simplify_derivative(deriv8)
 print(f"Result: {simplified8}")
+print()
+
+# Test 9: Repeated derivatives come from the cache
+print("Test 9: d/dx((x + 1)^2) again")
+from solver import derivative_cache
+hits = derivative_cache.hits
+simplified9 = simplify_derivative(derivative(expr8, x))
+print(f"Result: {simplified9}")
+print(f"Cache hits: {derivative_cache.hits - hits}")
+print()
+
+# Test 10: Deep expressions do not hit the recursion limit
+print("Test 10: d/dx of a 20000-level nested expression")
+expr10 = x
+for _ in range(10000):
+    expr10 = -(expr10 + 1)
+deriv10 = simplify_derivative(derivative(expr10, x))
+print(f"Printed length: {len(str(expr10))}")
+print(f"Result: {deriv10}")
+print()
+
+# Test 11: Numeric gradient by reverse-mode AD at two points
+print("Test 11: gradient of x**2*y + y/z at (1, 2, 1) and (3, 1, 2)")
+y, z = symbols('y, z')
+print(f"Result: {gradient(x**2*y + y/z, [x, y, z], [[1, 2, 1], [3, 1, 2]]).tolist()}")
+print(f"Division by zero: {gradient(x / 0, x, [1.0]).tolist()}, {gradient(1 / x, x, [0.0, 2.0]).tolist()}")
+print()
+
+# Test 12: Values of f, f' and f'' by forward-mode evaluation
+print("Test 12: x**3 - 3*x and its derivatives at 0, 1, 2")
+print(f"Result: {evaluate_derivatives(x**3 - 3*x, x, [0, 1, 2], order=2).tolist()}")
+print()
+
+# Test 13: Product of 500 factors, derivative stays linear in size
+print("Test 13: d/dx (1 + x/1)*(1 + x/2)*...*(1 + x/500) at x = 0")
+expr13 = Mul(*[1 + x/i for i in range(1, 501)])
+deriv13 = simplify_derivative(derivative(expr13, x))
+print(f"Nodes: {len(postorder(expr13))} -> {len(postorder(deriv13))}")
+print(f"Result: {evaluate_expr(deriv13, x, 0):.6f}")
+print(f"At the root x = -1 of the first factor: {evaluate_expr(deriv13, x, -1):.6f}")
+print()
+
+# Test 14: Rule-based simplification of leftover identities
+print("Test 14: simplify (2 * (x**1)) + ((0 + 1) * x) and (x**3 / x) - x**2")
+print(f"Result: {simplify(Mul(2, Pow(x, 1)) + Mul(Add(0, 1), x))}, {simplify(Sub(Div(x**3, x), x**2))}")
+print(f"Across differences: {simplify(x - 1 + x)}, {simplify((x - 1) - (x - 2))}, {simplify(x**3 / x - 2*x**2)}")
+print()
+
+# Test 15: Only expanded polynomials are differentiated as Poly
+print("Test 15: d/dx (x - 1.1)**40 and d/dx 3*x**2 - x + 4")
+deriv15 = derivative((x - 1.1)**40, x)
+print(f"Result: {deriv15}, {derivative(3*x**2 - x + 4, x)}")
+print(f"At x = 1.2: {evaluate_expr(deriv15, x, 1.2):.3g}")
@@ -3,7 +3,7 @@ Test script for the draw module
 """
 
 from symbolic_math import symbols
-from draw import plot_function, plot_multiple, plot_derivative_comparison
+from draw import plot_function, plot_multiple, plot_derivative_comparison, adaptive_sample, auto_range, close_plots, export_batch
 
 # Get the variable
 x = symbols('x')
@@ -42,4 +42,49 @@ plot_function(
     export_path="test_plot.png"
 )
 
+# Test 6: Adaptive sampling breaks the line at a pole
+print("Test 6: Adaptive sampling of 1/(x - 0.3)")
+x_values, y_values = adaptive_sample(lambda v: 1 / (v - 0.3), -10, 10, budget=200)
+breaks = x_values[y_values != y_values]
+print(f"Samples: {len(x_values)}, line broken at: {breaks}")
+curves = adaptive_sample(lambda v: [1 / (v - 0.3), -1 / (v - 0.3)**2], -10, 10, budget=200)
+print(f"With its derivative, samples: {[len(c[0]) for c in curves]}, "
+      f"breaks: {[c[0][c[1] != c[1]].tolist() for c in curves]}")
+x_values, y_values = adaptive_sample(lambda v: v / abs(v), -1.3, 1.1, budget=500)
+print(f"x/|x| broken at: {x_values[y_values != y_values].round(6).tolist()}")
+print(f"x^3 - 3x with its derivative: {auto_range(x**3 - 3*x, derivatives=True)}")
+
+# Test 7: Automatic range around roots, extrema and poles
+print("Test 7: Automatic range of x^3 - 3x and 1/(x^2 - 1)")
+print(f"x^3 - 3x: {auto_range(x**3 - 3*x)}")
+print(f"1/(x^2 - 1): {auto_range(1 / (x**2 - 1))}")
+print(f"x*2^(-x): {auto_range(x * 2**(-x))}, on [-0.2, 6]: {auto_range(x * 2**(-x), 'x', -0.2, 6)}")
+plot_function(1 / (x**2 - 1), var_name='x', title="Automatic Range")
+
+# Test 8: Plot windows open in the background without blocking
+print("Test 8: Background plot of x^2 + 1")
+import time
+start = time.perf_counter()
+plot_function(x**2 + 1, var_name='x')
+print(f"Returned before rendering: {time.perf_counter() - start < 1}")
+close_plots()
+
+# Test 9: Headless rendering saves instead of opening a window
+print("Test 9: Headless plot of x^2 - 1")
+import os
+os.environ['ANCALC_HEADLESS'] = '1'
+plot_function(x**2 - 1, var_name='x', export_path="test_plot.png")
+print(f"Saved: {os.path.exists('test_plot.png')}")
+
+# Test 10: Batch export over two worker processes
+print("Test 10: Batch export of x, x^2 and x^3 to PNG and SVG")
+import tempfile
+with tempfile.TemporaryDirectory() as folder:
+    jobs = [(x, (-2, 2), os.path.join(folder, 'x.png')),
+            (x**2, None, os.path.join(folder, 'x2.svg')),
+            (x**3, (-3, 3), os.path.join(folder, 'x3.png'))]
+    results = export_batch(jobs, dpi=50, processes=2)
+    print(f"Files written: {sorted(os.listdir(folder))}")
+    print(f"Errors: {[error for path, seconds, error in results if error]}")
+
 print("\nAll tests completed!")
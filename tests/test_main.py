@@ -0,0 +1,35 @@
+"""
+Test script for the calculator's startup cost
+"""
+
+import os
+import subprocess
+import sys
+
+# Seconds main may take to import (it starts once per calculator process)
+IMPORT_TIME_BUDGET = 0.1
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+measure = """
+import sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(elapsed, [name for name in ('numpy', 'matplotlib') if name in sys.modules])
+"""
+
+# Test 1: Importing main loads no plotting or numeric libraries
+print("Test 1: Import time of main")
+output = subprocess.run([sys.executable, "-c", measure], cwd=root, capture_output=True, text=True).stdout.split(maxsplit=1)
+elapsed, heavy = float(output[0]), output[1].strip()
+print(f"Import time: {elapsed * 1000:.1f} ms (budget {IMPORT_TIME_BUDGET * 1000:.0f} ms)")
+print(f"Heavy modules loaded: {heavy}")
+print(f"Within budget: {elapsed < IMPORT_TIME_BUDGET}")
+
+# Test 2: A session started from the repository directory
+print("\nTest 2: Solving in a main.py session")
+session = subprocess.run([sys.executable, "main.py"], cwd=root, input="solve x**2 - 4 = 0\n",
+                         capture_output=True, text=True).stdout
+print(f"Output: {session.splitlines()[0]}")
+
+print("\nAll tests completed!")
@@ -0,0 +1,63 @@
+"""
+Test script for the sparse polynomial type
+"""
+
+from symbolic_math import symbols, Eq
+from poly import Poly, to_poly, cancel
+from solver import solve, derivative
+
+x, y = symbols('x, y')
+
+# Test 1: Expanding (x + 1)**3
+print("Test 1: (x + 1)**3 as a Poly")
+p = to_poly((x + 1)**3, x)
+print(f"Poly: {p}")
+print(f"Coefficients: {p.coeffs()}")
+print(f"Expression: {p.to_expr(x)}")
+print()
+
+# Test 2: Derivative and Horner evaluation
+print("Test 2: x**100 + 1, derivative and value at 1")
+p2 = to_poly(x**100 + 1, x)
+print(f"Derivative: {p2.deriv()}")
+print(f"Value at 1: {p2(1)}")
+print()
+
+# Test 3: Non-polynomials are rejected
+print("Test 3: 1/x and x*y")
+print(f"Result: {to_poly(1/x, x)}, {to_poly(x*y, x)}")
+print()
+
+# Test 4: Solving an unexpanded quadratic (x + 1)*(x - 3) = 0
+print("Test 4: (x + 1)*(x - 3) = 0")
+print(f"Solutions: {solve(Eq((x + 1)*(x - 3), 0), x)}")
+print()
+
+# Test 5: Polynomial derivative fast path
+print("Test 5: d/dx (x**2 + 1)**2")
+print(f"Result: {derivative((x**2 + 1)**2, x)}")
+print(f"Same as Poly: {Poly({3: 4, 1: 4}) == to_poly(derivative((x**2 + 1)**2, x), x)}")
+print()
+
+# Test 6: Roots of a quintic with a double root
+print("Test 6: (x - 1)**2 * (x + 2) * (x**2 + 1) = 0")
+eq6 = Eq((x - 1)**2 * (x + 2) * (x**2 + 1), 0)
+print(f"Real solutions: {solve(eq6, x)}")
+print(f"All solutions: {solve(eq6, x, complex_roots=True)}")
+print()
+
+# Test 7: Cancelling common factors of rational functions
+print("Test 7: x**2 / x and (x**2 - 1) / (x - 1)")
+print(f"Result: {cancel(x**2 / x, x)}, {cancel((x**2 - 1) / (x - 1), x)}")
+print(f"Derivative of x**2 / x: {derivative(x**2 / x, x)}")
+print(f"Solutions of (x - 1)**2 / (x - 1) = 0: {solve(Eq((x - 1)**2 / (x - 1), 0), x)}")
+print()
+
+# Test 8: Close but distinct roots are not merged
+print("Test 8: (1000000*x - 1000000) * (1000000*x - 1000001) * (x + 5) = 0")
+print(f"Solutions: {solve(Eq((1000000*x - 1000000)*(1000000*x - 1000001)*(x + 5), 0), x)}")
+print()
+
+# Test 9: Exact multiple roots are found once, whatever their multiplicity
+print("Test 9: (x - 1)**6 = 0")
+print(f"Solutions: {solve(Eq((x - 1)**6, 0), x)}")
@@ -4,7 +4,7 @@ Test script for the custom symbolic math and solver system
 
 # Import from our custom modules
 from symbolic_math import symbols, Eq
-from solver import solve
+from solver import solve, classify, solve_batch
 
 # Test 1: Simple quadratic equation x^2 - 4 = 0
 print("Test 1: x^2 - 4 = 0")
@@ -37,3 +37,45 @@ eq4 = Eq(x**2 - 6*x + 9, 0)
 print(f"Equation: {eq4}")
 solutions4 = solve(eq4, x)
 print(f"Solutions: {solutions4}")
+print()
+
+# Test 5: Compiled evaluation matches the tree walker
+print("Test 5: compile_expr(x^3 + 2x^2 - x/2, x)")
+from solver import compile_expr, evaluate_expr
+expr5 = x**3 + 2*x**2 - x/2
+f5 = compile_expr(expr5, x)
+print(f"f(3) = {f5(3)} (evaluate_expr: {evaluate_expr(expr5, x, 3)})")
+print(f"Cached: {compile_expr(expr5, x) is f5}")
+print()
+
+# Test 6: Vectorized evaluation over an array (poles become inf/NaN)
+print("Test 6: evaluate_array(1/x + x^0.5, x, [-1, 0, 1, 4])")
+from solver import evaluate_array
+print(f"Values: {evaluate_array(1/x + x**0.5, x, [-1, 0, 1, 4])}")
+print()
+
+# Test 7: Rational equation (x**2 - 1) / (x - 1) = 0, x = 1 is not a solution
+print("Test 7: (x**2 - 1) / (x - 1) = 0")
+eq7 = Eq((x**2 - 1) / (x - 1), 0)
+print(f"Kind: {classify(eq7, x)[0]}")
+print(f"Solutions: {solve(eq7, x)}")
+print()
+
+# Test 8: Numeric solve in a range, 2**x = 3
+print("Test 8: 2**x = 3 in -10 10")
+eq8 = Eq(2**x, 3)
+print(f"Kind: {classify(eq8, x)[0]}")
+print(f"Solutions: {solve(eq8, x, interval=(-10, 10))}")
+print()
+
+# Test 9: Linear system 2x + y = 3, x - y = 0
+print("Test 9: 2x + y = 3; x - y = 0")
+y = symbols('y')
+print(f"Solution: {solve([Eq(2*x + y, 3), Eq(x - y, 0)], [x, y])}")
+print()
+
+# Test 10: Batched quadratic a*x^2 + b*x + c = 0 over coefficient columns
+print("Test 10: a*x^2 + b*x + c = 0 for three (a, b, c) rows")
+a, b, c = symbols('a, b, c')
+roots10 = solve_batch(Eq(a*x**2 + b*x + c, 0), x, {a: [1, 1, 0], b: [0, 5, 2], c: [-4, 6, 4]})
+print(f"Roots:\n{roots10}")
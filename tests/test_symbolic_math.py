@@ -0,0 +1,80 @@
+"""
+Test script for the expression nodes
+"""
+
+from symbolic_math import symbols, Add, Sub, Div, Pow, cse, let_form
+
+x, y = symbols('x, y')
+
+# Test 1: Identical subtrees are the same object
+print("Test 1: (x + 1)**2 built twice")
+a = (x + 1)**2
+b = Pow(Add(x, 1), 2)
+print(f"Expression: {a}")
+print(f"Same object: {a is b}")
+print()
+
+# Test 2: Nodes are immutable
+print("Test 2: Assigning to a node")
+try:
+    a.args = (y, 3)
+    print("Result: assignment allowed")
+except AttributeError as e:
+    print(f"Result: {e}")
+print()
+
+# Test 3: Expressions as dict keys, == still builds equations
+print("Test 3: Structural keys")
+cache = {x**2 + 1: "square plus one"}
+print(f"Lookup: {cache[x**2 + 1]}")
+print(f"Equals: {(x**2 + 1).equals(x**2 + 1)}, {(x**2 + 1).equals(x**2 + 2)}")
+print(f"Equation: {x**2 + 1 == y}")
+key3 = (x**2 + 3*x + 7).key()
+import gc
+gc.collect()
+print(f"Key after rebuilding: {(x**2 + 3*x + 7).key() == key3}, of 7.0: {(x**2 + 3*x + 7.0).key() == key3}")
+print()
+
+# Test 4: Sums and products are flattened and like terms collected
+print("Test 4: x + 1 + x + x*x + 2*x**2")
+expr4 = x + 1 + x + x*x + 2*x**2
+print(f"Result: {expr4}")
+print(f"Operands: {len(expr4.args)}")
+print()
+
+# Test 5: Shared subexpressions get named temporaries
+print("Test 5: cse of x*(x + 1)**2 + (x + 1)**2")
+replacements, reduced = cse(x*(x + 1)**2 + (x + 1)**2)
+print(f"Replacements: {replacements}")
+print(f"Reduced: {reduced}")
+print(let_form(x*(x + 1)**2 + (x + 1)**2))
+print()
+
+# Test 6: Constructors fold numbers and drop identities
+print("Test 6: 2*3*x + 0, x**1 * 1, (x - x) * y, x / 1 + 2**3")
+print(f"Result: {2*3*x + 0}, {x**1 * 1}, {(x - x) * y}, {x / 1 + 2**3}")
+print(f"Pow(2, 10) = {Pow(2, 10)}, Sub(5, 2) = {Sub(5, 2)}, Div(0, x) = {Div(0, x)}")
+print(f"Div(0, 0) = {Div(0, 0)}, Div(x - x, x - x) = {Div(x - x, x - x)}, x / x = {x / x}")
+print()
+
+# Test 7: Ordering compares flat keys, however deep the operands are
+print("Test 7: Sum of two 600-level nested squares, sum built term by term")
+deep_x, deep_y = x, y
+for _ in range(600):
+    deep_x, deep_y = (deep_x + 1)**2, (deep_y + 1)**2
+print(f"Operands: {len((deep_x + deep_y).args)}")
+terms7 = [k * x**k for k in range(1, 2001)] + [-k * x**k for k in range(1, 1001)] + [5]
+expr7 = 0
+for term in terms7:
+    expr7 = expr7 + term
+print(f"Same as Add(*terms): {expr7 is Add(*terms7)}, operands: {len(expr7.args)}")
+print(f"Order: {x*y + y + x + y**2 + x**2 + 1}")
+print()
+
+# Test 8: Differences are sums of negated terms
+print("Test 8: x - 1 + x, 2*x - x, (x - 1) - (x - 2), x**3 - 2*x**2 - x - 1")
+print(f"Result: {x - 1 + x}, {2*x - x}, {(x - 1) - (x - 2)}, {x**3 - 2*x**2 - x - 1}")
+expr8 = x
+for k in range(2000):
+    expr8 = expr8 - x**(k + 2)
+print(f"2000 differences, operands: {len(expr8.args)}")
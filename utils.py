@@ -1,3 +1,7 @@
+import importlib
+from collections import OrderedDict
+
+
 def format_solution(solutions):
     """Format solutions for display"""
     if not solutions:
@@ -17,3 +21,67 @@ def is_number(s):
         return True
     except ValueError:
         return False
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported on first attribute access
+
+    Keeps heavy imports (NumPy) out of startup for sessions that never need
+    them. After the import the module's names are copied onto the stand-in,
+    so later lookups cost the same as on the module itself.
+    """
+
+    def __init__(self, name):
+        self._lazy_name = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._lazy_name)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+class LRUCache:
+    """Size-bounded least-recently-used cache with hit/miss counters"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        """Return the cached value for key (marking it recently used) or default"""
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Store value for key, evicting the least recently used entries"""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def resize(self, maxsize):
+        """Change the size bound, evicting entries if needed"""
+        self.maxsize = maxsize
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f"LRUCache(hits={self.hits}, misses={self.misses}, size={len(self)}/{self.maxsize})"